@@ -7,19 +7,23 @@
 
 
 import { fork } from "child_process";
-import { checkoutBranch, buildPath } from "./utils.js";
-import { branches, runsPerBranch } from "./benchmark_target.js";
+import { checkoutBranch, buildPath, getCommit } from "./utils.js";
+import { branches, runsPerBranch, sequential } from "./benchmark_target.js";
 import path from "path";
 import { fileURLToPath } from "url";
 import fs from "fs";
 import os from "os";
 
 
+// Commit hash of each branch, stored with the results
+const commits = {};
+
 // Build all branches and copy their build files to temp dirs
 async function buildAllBranches() {
     const tempDirs = {};
     for (const branch of branches) {
         checkoutBranch(branch);
+        commits[branch] = getCommit("HEAD");
         const buildFile = buildPath();
         const tempDir = fs.mkdtempSync(path.join(os.tmpdir(), `benchmark_${branch}_`));
         const destFile = path.join(tempDir, "o_spreadsheet.esm.js");
@@ -68,6 +72,59 @@ function stderr(arr) {
 
 
 
+function median(arr) {
+    const sorted = [...arr].sort((a, b) => a - b);
+    const middle = Math.floor(sorted.length / 2);
+    return sorted.length % 2 ? sorted[middle] : (sorted[middle - 1] + sorted[middle]) / 2;
+}
+
+function resample(arr) {
+    return arr.map(() => arr[Math.floor(Math.random() * arr.length)]);
+}
+
+/**
+ * Percentile bootstrap 95% confidence interval of median(candidate) / median(baseline)
+ */
+function bootstrapRatioCI(baseline, candidate, resamples = 500) {
+    const ratios = [];
+    for (let i = 0; i < resamples; i++) {
+        ratios.push(median(resample(candidate)) / median(resample(baseline)));
+    }
+    ratios.sort((a, b) => a - b);
+    return [ratios[Math.floor(0.025 * (resamples - 1))], ratios[Math.ceil(0.975 * (resamples - 1))]];
+}
+
+/**
+ * Reason to stop the sequential runs, if any, see `sequential` in benchmark_target.js
+ */
+function sequentialStopReason(results, runs, elapsedMs) {
+    if (sequential.timeBudgetMs !== null && elapsedMs >= sequential.timeBudgetMs) {
+        return `time budget of ${sequential.timeBudgetMs} ms spent after ${runs} runs`;
+    }
+    if (runs < sequential.minRuns) return null;
+    const baseline = branches[0];
+    const events = new Set(results[baseline].flatMap(obj => Object.keys(obj)));
+    for (const event of events) {
+        const baselineArr = results[baseline].map(obj => obj[event]).filter(v => v !== undefined);
+        for (const branch of branches.slice(1)) {
+            const arr = results[branch].map(obj => obj[event]).filter(v => v !== undefined);
+            // event not recorded by one of the branches, e.g. renamed: nothing to compare
+            if (!arr.length) continue;
+            if (baselineArr.length < 2 || arr.length < 2) return null;
+            const [low, high] = bootstrapRatioCI(baselineArr, arr);
+            if (!((high - low) / 2 <= sequential.precision)) return null;
+        }
+    }
+    return `precision of ${(sequential.precision * 100).toFixed(1)}% reached after ${runs} runs`;
+}
+
+
+function writeResults(resultsPath, trials) {
+    const results = { settings: { branches, runs: runsPerBranch, warmup: 0 }, commits, trials };
+    fs.writeFileSync(resultsPath, JSON.stringify(results));
+}
+
+
 export async function startBenchmarking() {
     // Step 1: Build all branches and copy build files
     const branchBuilds = await buildAllBranches();
@@ -78,13 +135,29 @@ export async function startBenchmarking() {
     for (const branch of branches) {
         eventTimingsArrByBranch[branch] = [];
     }
+    const trials = [];
     const workerPath = getWorkerPath();
+    const start = performance.now();
     for (let i = 0; i < totalRuns; i++) {
         const branch = branches[i % branches.length];
+        const block = Math.floor(i / branches.length);
+        if (sequential.enabled && i > 0 && i % branches.length === 0) {
+            const reason = sequentialStopReason(eventTimingsArrByBranch, block, performance.now() - start);
+            if (reason) {
+                console.log(`Stopped: ${reason}`);
+                break;
+            }
+        }
         const buildFilePath = branchBuilds[branch].buildFile;
-        console.log(`Running benchmark for branch ${branch}, run ${Math.floor(i / branches.length) + 1}/${runsPerBranch}`);
+        console.log(`Running benchmark for branch ${branch}, run ${block + 1}/${runsPerBranch}`);
         const result = await runChild(workerPath, buildFilePath, branch);
         eventTimingsArrByBranch[branch].push(result.eventTimings);
+        trials.push({ branch, target: "benchmark_target.js", block, warmup: false, timings: result.eventTimings, records: result.records });
+    }
+
+    // Raw samples, analyzed by `sp_tool benchmark`
+    if (process.env.BENCHMARK_RESULTS_PATH) {
+        writeResults(process.env.BENCHMARK_RESULTS_PATH, trials);
     }
 
     // --- Analysis function ---
@@ -111,7 +184,6 @@ export async function startBenchmarking() {
                     bestEventBranch = branch;
                 }
             }
-            if (bestEventMean < 5) continue; // Skip event if best mean < 5ms
             // Compute stats for each branch
             for (const branch of branches) {
                 const arr = results[branch].map(obj => obj[event]).filter(v => v !== undefined);
@@ -10,6 +10,18 @@ import { makeLargeDataset } from "./dataset_factory.js";
 export const branches = ["master"];
 export const runsPerBranch = 20;
 
+/**
+ * Sequential mode: the runs stop as soon as the 95% confidence interval of the
+ * ratio of every event to the first branch is within +/- `precision`, or when
+ * `timeBudgetMs` is spent. `runsPerBranch` is then the maximum number of runs.
+ */
+export const sequential = {
+  enabled: false,
+  minRuns: 5,
+  precision: 0.02,
+  timeBudgetMs: null,
+};
+
 /**
  * Setup function run before measurement begins.
  * Return an object with:
@@ -5,6 +5,7 @@
 
 import { benchmark, setup } from "./benchmark_target.js";
 import { buildPath, gc } from "./utils.js";
+import { aggregate, parseRecords } from "./timings.js";
 
 async function runMeasured() {
     const enginePath = process.env.BENCHMARK_ENGINE_PATH || buildPath();
@@ -16,7 +17,7 @@ async function runMeasured() {
     const logs = [];
     // Patch console.debug to collect logs and avoid polluting the console
     console.debug = function(...args) {
-		logs.push(args.map(String).join(" "));   
+        logs.push({ args, time: performance.now() });
     };
     gc();
     const start = performance.now();
@@ -24,29 +25,11 @@ async function runMeasured() {
     const end = performance.now();
     console.debug = origDebug;
     const durationMs = end - start;
-    const eventTimings = parseEventTimings(logs);
+    const records = parseRecords(logs);
+    const eventTimings = aggregate(records);
     // Add total time as a regular event called 'Global'
     eventTimings["Global"] = durationMs;
-    process.send({ eventTimings });
-}
-
-/**
- * Parses timing event logs and extracts event timings
- * from logs of the form:
- *   "evaluate all cells 83.20 ms"
- */
-function parseEventTimings(logs) {
-    const eventTimings = {};
-    const timingRegex = /([\w .]+) (\d+(?:\.\d+)?) ms/;
-    for (const line of logs) {
-        const match = line.match(timingRegex);
-        if (match) {
-            const event = match[1].trim();
-            const time = parseFloat(match[2]);
-            eventTimings[event] = time;
-        }
-    }
-    return eventTimings;
+    process.send({ eventTimings, records });
 }
 
 runMeasured();
@@ -0,0 +1,105 @@
+/**
+ * Timing records built from the console.debug messages of the benchmarked code.
+ * Same format as scripts/spreadsheet_benchmark/timings.py:
+ * { name, path, depth, index, start, duration }
+ *  - `path` lists the enclosing groups, opened by messages like "##### Model creation #####"
+ *    and closed by a message made of "#" only,
+ *  - `index` is the repetition of the same name in the same path,
+ *  - `start` and `duration` are in ms.
+ * Messages "[sp-bench] <json record>" are records emitted as is, other messages
+ * are timings when they end with "<number> ms".
+ */
+
+const RECORD_PREFIX = "[sp-bench]";
+const GROUP_RE = /^(#{3,})\s*(.*?)\s*#*$/;
+const NUMBER_RE = /^-?\d+(?:\.\d+)?(?:e-?\d+)?$/;
+const PATH_SEPARATOR = " > ";
+
+/**
+ * @param {{ args: any[], time: number }[]} messages
+ */
+export function parseRecords(messages) {
+    const records = [];
+    const path = [];
+    const counts = new Map();
+    for (const { args, time } of messages) {
+        let record;
+        if (args[0] === RECORD_PREFIX) {
+            const emitted = JSON.parse(args[1]);
+            record = { path: emitted.path || [...path], ...emitted };
+        } else {
+            const group = parseGroup(args);
+            if (group !== null) {
+                if (group) {
+                    path.push(group);
+                } else {
+                    path.pop();
+                }
+                continue;
+            }
+            const timing = parseTiming(args);
+            if (!timing) continue;
+            record = { ...timing, path: [...path], start: time - timing.duration };
+        }
+        const key = JSON.stringify([record.path, record.name]);
+        const index = counts.get(key) || 0;
+        counts.set(key, index + 1);
+        records.push({
+            name: record.name,
+            path: record.path,
+            depth: record.path.length,
+            index,
+            start: record.start ?? null,
+            duration: record.duration,
+        });
+    }
+    return records;
+}
+
+/**
+ * Total duration by event (path and name): repetitions are summed, nested
+ * records are kept apart from the records of the same name elsewhere.
+ */
+export function aggregate(records) {
+    const timings = {};
+    for (const record of records) {
+        const event = [...record.path, record.name].join(PATH_SEPARATOR);
+        timings[event] = (timings[event] || 0) + record.duration;
+    }
+    return timings;
+}
+
+function tokens(args) {
+    const result = [];
+    for (const arg of args) {
+        if (typeof arg === "number") {
+            result.push(arg);
+            continue;
+        }
+        for (const word of String(arg).split(/\s+/).filter(Boolean)) {
+            result.push(NUMBER_RE.test(word) ? parseFloat(word) : word);
+        }
+    }
+    return result;
+}
+
+/**
+ * Name of the group opened by the message, "" if it closes one, null otherwise
+ */
+function parseGroup(args) {
+    if (args.length !== 1 || typeof args[0] !== "string") return null;
+    const match = args[0].trim().match(GROUP_RE);
+    return match ? match[2] : null;
+}
+
+/**
+ * Name and duration of a message ending with "<number> ms". The name is made of
+ * the words before the duration, without the other numbers.
+ */
+function parseTiming(args) {
+    const words = tokens(args);
+    const n = words.length;
+    if (n < 2 || words[n - 1] !== "ms" || typeof words[n - 2] !== "number") return null;
+    const name = words.slice(0, n - 2).filter(w => typeof w === "string").join(" ");
+    return { name: name || "Global", duration: words[n - 2] };
+}
@@ -17,6 +17,11 @@ export function checkoutBranch(branch) {
     execSync("npm run perf", { stdio: "inherit", cwd: oSpreadsheetPath });
 }
 
+export function getCommit(branch) {
+    const oSpreadsheetPath = getOdooSpreadsheetRepoPath();
+    return execSync(`git rev-parse ${branch}^{commit}`, { cwd: oSpreadsheetPath }).toString().trim();
+}
+
 export function buildPath() {
     return path.join(getOdooSpreadsheetRepoPath(), "dist", "o_spreadsheet.esm.js");
 }
@@ -10,6 +10,10 @@
     'assets': {
         'spreadsheet.o_spreadsheet': [
             'spreadsheet_benchmark/static/src/**/*.js',
+            ('remove', 'spreadsheet_benchmark/static/src/backend/**/*'),
+        ],
+        'web.assets_backend': [
+            'spreadsheet_benchmark/static/src/backend/**/*.js',
         ],
     }
 }
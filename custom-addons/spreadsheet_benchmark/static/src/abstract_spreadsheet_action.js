@@ -1,6 +1,7 @@
 import { AbstractSpreadsheetAction } from "@spreadsheet_edition/bundle/actions/abstract_spreadsheet_action";
 import { patch } from "@web/core/utils/patch";
 import { globalFieldMatchingRegistry } from "@spreadsheet/global_filters/helpers";
+import { markFullyLoaded } from "@spreadsheet_benchmark/bench_record";
 
 patch(AbstractSpreadsheetAction.prototype, {
     createModel() {
@@ -14,7 +15,7 @@ patch(AbstractSpreadsheetAction.prototype, {
             return false;
         }
         if (!hasDataSource()) {
-            console.log("spreadsheet fully loaded")
+            markFullyLoaded();
         }
     }
 });
\ No newline at end of file
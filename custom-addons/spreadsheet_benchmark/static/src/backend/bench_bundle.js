@@ -0,0 +1,28 @@
+/**
+ * Load the o-spreadsheet library of a benchmarked build instead of the one of
+ * the Odoo sources, when the page url has a `sp_bench_bundle` parameter (see
+ * bundle_url in scripts/spreadsheet_benchmark/runner.py). Each build has its
+ * own assets bundle, created by the spreadsheet_benchmark test, so that the
+ * bundle of a build is compiled once whatever the order of the page loads.
+ */
+import { assets } from "@web/core/assets";
+
+const SPREADSHEET_BUNDLE = "spreadsheet.o_spreadsheet";
+// read when the backend is loaded, before the router rewrites the url
+const benchBundle = new URLSearchParams(window.location.search).get("sp_bench_bundle");
+
+if (benchBundle) {
+    // depending on the version, loadBundle gets the files of the bundle from getBundle
+    for (const method of ["loadBundle", "getBundle"]) {
+        const original = assets[method];
+        if (typeof original !== "function") {
+            continue;
+        }
+        assets[method] = function (bundleName, ...args) {
+            if (bundleName === SPREADSHEET_BUNDLE) {
+                bundleName = `spreadsheet_benchmark.o_spreadsheet_${benchBundle}`;
+            }
+            return original.call(this, bundleName, ...args);
+        };
+    }
+}
@@ -0,0 +1,29 @@
+/**
+ * Timing records read by the spreadsheet_benchmark test, see
+ * scripts/spreadsheet_benchmark/timings.py
+ */
+
+let fullyLoaded = false;
+
+/**
+ * Emit a timing record. Without `start`, the record is assumed to end now.
+ * @param {string} name
+ * @param {number} duration - ms
+ * @param {number} [start] - ms since the navigation start
+ */
+export function benchRecord(name, duration, start = performance.now() - duration) {
+    console.log("[sp-bench]", JSON.stringify({ name, start, duration }));
+}
+
+/**
+ * Record the time from the navigation start to the fully loaded spreadsheet
+ * and send the success signal of the test, only once per page load.
+ */
+export function markFullyLoaded() {
+    if (fullyLoaded) {
+        return;
+    }
+    fullyLoaded = true;
+    benchRecord("spreadsheet fully loaded", performance.now(), 0);
+    console.log("spreadsheet fully loaded");
+}
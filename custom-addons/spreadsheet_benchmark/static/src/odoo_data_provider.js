@@ -1,5 +1,6 @@
 import { OdooDataProvider } from "@spreadsheet/data_sources/odoo_data_provider";
 import { patch } from "@web/core/utils/patch";
+import { markFullyLoaded } from "@spreadsheet_benchmark/bench_record";
 
 
 patch(OdooDataProvider.prototype, {
@@ -8,7 +9,7 @@ patch(OdooDataProvider.prototype, {
         // use a setTimeout to check after the evaluation
         setTimeout(() => {
             if (!this.pendingPromises.size) {
-                console.log("spreadsheet fully loaded")
+                markFullyLoaded();
             }
         })
     }
@@ -1,36 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join
 from lxml import etree
+import hashlib
 import logging
 import json
+import os
+import time
 
 
-from odoo import api, models, modules
+from odoo import api, models, modules, tools
 from odoo.tools.misc import file_path, file_open
 from odoo.addons.spreadsheet_dashboard_script.tools.pretty_json_encoder import pretty_json_dump
+from odoo.addons.spreadsheet_dashboard_script.tools.dashboard_transforms import transform_files
 
 
 _logger = logging.getLogger(__name__)
 
+# default maximum size of the files loaded in a batch by get_dashboard_files_batch
+DASHBOARD_BATCH_SIZE = 20 * 1024 * 1024
+
+# { data file path: ((mtime, size), dashboard files referenced in the data file) }
+_data_file_index = {}
+# { dashboard file path: ((mtime, size), hash of its content) }
+_dashboard_hashes = {}
+
+
+def _json_hash(data):
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _file_contains(source, marker, chunk_size=1024 * 1024):
+    overlap = b''
+    while chunk := source.read(chunk_size):
+        if marker in chunk or marker in overlap + chunk[:len(marker) - 1]:
+            return True
+        overlap = chunk[1 - len(marker):]
+    return False
+
+
+def _project(data, fields):
+    """Keep only the given fields of *data*. Fields are dotted paths which go
+    through lists, e.g. `sheets.cells` keeps the cells of every sheet."""
+    tree = {}
+    for field in fields:
+        node = tree
+        for key in field.split('.'):
+            node = node.setdefault(key, {})
+    return _project_tree(data, tree)
+
+
+def _project_tree(data, tree):
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [_project_tree(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: _project_tree(data[key], subtree) for key, subtree in tree.items() if key in data}
+    return data
+
 
 class SpreadsheetDashboard(models.Model):
     _inherit= 'spreadsheet.dashboard'
 
     @api.model
-    def get_dashboard_files(self):
-        result = {}
-        modules = self.env['ir.module.module'].search([])
-        dashboard_modules = modules.filtered(lambda m: 'spreadsheet_dashboard' in m.dependencies_id.mapped('name'))
-        for module in dashboard_modules:
-            for path in self._get_data_filepaths(module.name):
-                for dashboard_file in self._parse_xml(path):
-                    with file_open(dashboard_file, mode='r') as f:
-                        result[dashboard_file] = json.load(f)
+    def get_dashboard_files(self, max_workers=None):
+        """Return the content of every dashboard data file, by file path.
+
+        Data files are parsed and dashboards are loaded by a pool of
+        `max_workers` threads (default of ThreadPoolExecutor if None).
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            dashboard_files = self._get_dashboard_file_paths(executor)
+            # map keeps the order of the files, the result is the same whatever the number of workers
+            return dict(zip(dashboard_files, executor.map(self._load_dashboard_file, dashboard_files)))
+
+    @api.model
+    def get_dashboard_files_batch(self, cursor=0, byte_budget=DASHBOARD_BATCH_SIZE, fields=None):
+        """Paginated version of `get_dashboard_files`, to process many dashboards
+        with a bounded memory.
+
+        Returns the dashboards from the `cursor`-th one, as long as the size of
+        their files fits in `byte_budget` (always at least one dashboard):
+        `{'files': {path: data}, 'next_cursor': cursor of the next batch or False}`.
+        `fields` optionally restricts the loaded data, see `_project`.
+        """
+        with ThreadPoolExecutor() as executor:
+            dashboard_files = self._get_dashboard_file_paths(executor)
+        batch = next(self._iter_dashboard_files(dashboard_files[cursor:], byte_budget, fields), {})
+        next_cursor = cursor + len(batch)
+        return {
+            'files': batch,
+            'next_cursor': next_cursor if next_cursor < len(dashboard_files) else False,
+        }
+
+    @api.model
+    def write_dashboard_files(self, files_data, max_workers=None):
+        """Write the dashboards whose content differs from the file on disk.
+
+        Files are written by a pool of `max_workers` threads. Returns, by file,
+        whether it was 'written' or 'skipped', the number of bytes written and
+        the time spent.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            stats = executor.map(self._write_dashboard_file, files_data.keys(), files_data.values())
+            return dict(zip(files_data.keys(), stats))
+
+    @api.model
+    def transform_dashboard_files(self, steps, dry_run=False, max_workers=None):
+        """Apply registered python transformations to every dashboard file,
+        see `dashboard_transforms.transform_files`.
+
+        e.g. `[["rename_function", {"old": "ODOO.LIST", "new": "ODOO.LIST.VALUE"}]]`
+        """
+        with ThreadPoolExecutor() as executor:
+            dashboard_files = self._get_dashboard_file_paths(executor)
+        paths = {file_path(dashboard_file): dashboard_file for dashboard_file in dashboard_files}
+        result = transform_files(list(paths), steps, dry_run=dry_run, max_workers=max_workers)
+        summary = result['summary']
+        _logger.info(
+            "Transformed %s dashboards (%s changed, %s errors) in %.2fs: %.1f files/s, %.2f MB/s",
+            summary['files'], summary['changed'], summary['errors'], summary['seconds'],
+            summary['files_per_second'], summary['mb_per_second'],
+        )
+        for path, file_result in result['files'].items():
+            if file_result['status'] == 'error':
+                _logger.warning("Error transforming dashboard %s: %s", path, file_result['error'])
+        result['files'] = {paths[path]: file_result for path, file_result in result['files'].items()}
         return result
 
     @api.model
-    def write_dashboard_files(self, files_data):
-        for dashboard_file, data in files_data.items():
-            pretty_json_dump(data, dashboard_file)
+    @tools.ormcache()
+    def _get_dashboard_module_names(self):
+        modules = self.env['ir.module.module'].search([('dependencies_id.name', '=', 'spreadsheet_dashboard')])
+        return tuple(modules.mapped('name'))
+
+    def _get_dashboard_file_paths(self, executor):
+        paths = [
+            path
+            for module_name in self._get_dashboard_module_names()
+            for path in self._get_data_filepaths(module_name)
+        ]
+        return [
+            dashboard_file
+            for files in executor.map(self._get_data_file_dashboards, paths)
+            for dashboard_file in files
+        ]
+
+    def _iter_dashboard_files(self, dashboard_files, byte_budget=DASHBOARD_BATCH_SIZE, fields=None):
+        """Yield the dashboards by batches of `{path: data}` whose files size
+        fits in `byte_budget` (or of a single dashboard if it is larger)."""
+        batch = {}
+        batch_size = 0
+        for dashboard_file in dashboard_files:
+            size = os.path.getsize(file_path(dashboard_file))
+            if batch and batch_size + size > byte_budget:
+                yield batch
+                batch = {}
+                batch_size = 0
+            data = self._load_dashboard_file(dashboard_file)
+            batch[dashboard_file] = _project(data, fields) if fields else data
+            batch_size += size
+        if batch:
+            yield batch
 
     def _get_data_filepaths(self, module_name):
         manifest = modules.get_manifest(module_name)
@@ -38,19 +175,67 @@ class SpreadsheetDashboard(models.Model):
             if path.endswith('.xml'):
                 yield file_path(join(module_name, path), env=self.env)
 
+    def _get_data_file_dashboards(self, filepath):
+        """Dashboard files referenced in a data file, only parsed again if
+        the data file changed since the last call."""
+        signature = _file_signature(filepath)
+        cached = _data_file_index.get(filepath)
+        if cached and cached[0] == signature:
+            return cached[1]
+        files = tuple(self._parse_xml(filepath))
+        _data_file_index[filepath] = (signature, files)
+        return files
+
+    def _write_dashboard_file(self, dashboard_file, data):
+        start = time.perf_counter()
+        path = file_path(dashboard_file)
+        data_hash = _json_hash(data)
+        if self._get_dashboard_file_hash(path) == data_hash:
+            return {'status': 'skipped', 'bytes': 0, 'time': time.perf_counter() - start}
+        pretty_json_dump(data, path)
+        signature = _file_signature(path)
+        _dashboard_hashes[path] = (signature, data_hash)
+        return {'status': 'written', 'bytes': signature[1], 'time': time.perf_counter() - start}
+
+    def _get_dashboard_file_hash(self, path):
+        signature = _file_signature(path)
+        cached = _dashboard_hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, encoding='utf-8') as f:
+            try:
+                data_hash = _json_hash(json.load(f))
+            except ValueError:
+                # not a valid json file: overwrite it
+                return None
+        _dashboard_hashes[path] = (signature, data_hash)
+        return data_hash
+
+    def _load_dashboard_file(self, dashboard_file):
+        with file_open(dashboard_file, mode='r') as f:
+            return json.load(f)
+
     def _parse_xml(self, filepath):
         with file_open(filepath, mode='rb') as source:
+            # most data files do not define any dashboard: skip them without parsing
+            if not _file_contains(source, b'spreadsheet.dashboard'):
+                return []
+            source.seek(0)
+            files = []
             try:
-                tree = etree.parse(source)
+                for _event, node in etree.iterparse(source, tag='record'):
+                    if node.get('model') == 'spreadsheet.dashboard':
+                        for field_node in node.iterchildren():
+                            field_name = field_node.get('name')
+                            if field_name == 'spreadsheet_binary_data':
+                                files.append(field_node.get('file'))
+                            elif field_name == 'sample_dashboard_file_path':
+                                files.append(field_node.text)
+                    # free the records already processed
+                    node.clear()
+                    while node.getprevious() is not None:
+                        del node.getparent()[0]
             except etree.LxmlSyntaxError:
                 _logger.warning("Error parsing XML file %s", filepath)
-                tree = etree.fromstring('<data/>')
-        files = []
-        for node in tree.xpath("//record[@model='spreadsheet.dashboard']"):
-            for field_node in node.iterchildren():
-                field_name = field_node.get('name')
-                if field_name == 'spreadsheet_binary_data':
-                    files.append(field_node.get('file'))
-                elif field_name == 'sample_dashboard_file_path':
-                    files.append(field_node.text)
+                return []
         return files
@@ -16,12 +16,17 @@ for (const script of Object.values(scripts)) {
     topbarMenuRegistry.addChild(script.name, ["file", "dashboard-scripts"], {
         name: script.name,
         async execute(env) {
-            const result = {}
-            const dashboards = await env.services.orm.call("spreadsheet.dashboard", "get_dashboard_files");
-            for (const [file, data] of Object.entries(dashboards)) {
-                result[file] = script.execute(env, data);
+            // process the dashboards by batches to keep a bounded memory
+            let cursor = 0;
+            while (cursor !== false) {
+                const result = {};
+                const batch = await env.services.orm.call("spreadsheet.dashboard", "get_dashboard_files_batch", [], { cursor });
+                for (const [file, data] of Object.entries(batch.files)) {
+                    result[file] = script.execute(env, data);
+                }
+                await env.services.orm.call("spreadsheet.dashboard", "write_dashboard_files", [result]);
+                cursor = batch.next_cursor;
             }
-            await env.services.orm.call("spreadsheet.dashboard", "write_dashboard_files", [result]);
         }
 
     })
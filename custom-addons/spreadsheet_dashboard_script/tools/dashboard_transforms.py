@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from .pretty_json_encoder import write_json_atomic
+
+TRANSFORMS = {}
+"""Transformations by name. A transformation modifies the dashboard data
+given as first argument in place, and takes its options as keyword arguments."""
+
+# o-spreadsheet formula strings escape their quotes with a backslash: "a\"b"
+STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"')
+
+
+def register(name):
+    def decorator(func):
+        TRANSFORMS[name] = func
+        return func
+    return decorator
+
+
+def transform_files(paths, steps, dry_run=False, max_workers=None):
+    """Apply the transformation `steps`, a list of `[name, options]`, to the
+    dashboard files at `paths` in a pool of `max_workers` processes.
+
+    A file failing to be transformed is reported and left untouched, without
+    stopping the other ones. With `dry_run`, no file is written.
+    Returns the result of each file and a throughput summary.
+    """
+    unknown = [name for name, _options in steps if name not in TRANSFORMS]
+    if unknown:
+        raise ValueError(f"Unknown dashboard transformations: {', '.join(unknown)}")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(paths, executor.map(_transform_file, paths, repeat(steps), repeat(dry_run))))
+    elapsed = time.perf_counter() - start
+    size = sum(result['bytes'] for result in results.values())
+    statuses = [result['status'] for result in results.values()]
+    return {
+        'files': results,
+        'summary': {
+            'files': len(paths),
+            'changed': statuses.count('changed'),
+            'errors': statuses.count('error'),
+            'dry_run': dry_run,
+            'seconds': elapsed,
+            'files_per_second': len(paths) / elapsed if elapsed else 0,
+            'mb_per_second': size / 1024 ** 2 / elapsed if elapsed else 0,
+        },
+    }
+
+
+def _transform_file(path, steps, dry_run):
+    try:
+        size = os.path.getsize(path)
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        original = json.dumps(data)
+        for name, options in steps:
+            TRANSFORMS[name](data, **options)
+        changed = json.dumps(data) != original
+        if changed and not dry_run:
+            write_json_atomic(data, path)
+    except Exception as e:
+        return {'status': 'error', 'error': repr(e), 'bytes': 0}
+    return {'status': 'changed' if changed else 'unchanged', 'bytes': size}
+
+
+def _map_formulas(data, func):
+    """Replace the content of every formula cell by `func(content)`"""
+    for sheet in data.get('sheets', ()):
+        cells = sheet.get('cells', {})
+        for xc, cell in cells.items():
+            if isinstance(cell, dict):
+                content = cell.get('content')
+                if isinstance(content, str) and content.startswith('='):
+                    cell['content'] = func(content)
+            elif isinstance(cell, str) and cell.startswith('='):
+                cells[xc] = func(cell)
+
+
+def _sub_outside_strings(regex, repl, formula):
+    """`regex.sub(repl, formula)` ignoring the string literals of the formula"""
+    parts = []
+    position = 0
+    for match in STRING_RE.finditer(formula):
+        parts.append(regex.sub(repl, formula[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(regex.sub(repl, formula[position:]))
+    return ''.join(parts)
+
+
+@register('rename_function')
+def rename_function(data, old, new):
+    """Rename the function `old` to `new` in every formula"""
+    regex = re.compile(r'(?<![\w.])' + re.escape(old) + r'(?=\s*\()', re.IGNORECASE)
+    _map_formulas(data, lambda formula: _sub_outside_strings(regex, lambda _match: new, formula))
+
+
+@register('rename_sheet')
+def rename_sheet(data, old, new):
+    """Rename the sheet `old` to `new`, as well as the references to it in formulas"""
+    for sheet in data.get('sheets', ()):
+        if sheet.get('name') == old:
+            sheet['name'] = new
+    regex = re.compile(r"(?<![\w.'])(?:'" + re.escape(old.replace("'", "''")) + "'|" + re.escape(old) + r")!")
+    reference = (new if re.fullmatch(r'\w+', new) else "'" + new.replace("'", "''") + "'") + '!'
+    _map_formulas(data, lambda formula: _sub_outside_strings(regex, lambda _match: reference, formula))
+
+
+@register('bump_version')
+def bump_version(data, version):
+    data['version'] = version
@@ -1,12 +1,30 @@
 import json
+import os
+import shutil
+import tempfile
+from json.encoder import encode_basestring_ascii
 
-from odoo.tools.misc import file_open
+from odoo.tools import misc
 
 
 def pretty_json_dump(json_data, file_path):
-    with file_open(file_path, mode='w') as f:
-        json.dump(json_data, f, indent=2, cls=CompactJSONEncoder, ensure_ascii=False)
-        f.write('\n')
+    """Replace the content of *file_path*, an existing file of an addon."""
+    write_json_atomic(json_data, misc.file_path(file_path))
+
+
+def write_json_atomic(json_data, path):
+    """Write *json_data* in a temporary file which then replaces *path*,
+    so that *path* is never left half written."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with open(fd, mode='w', encoding='utf-8') as f:
+            json.dump(json_data, f, indent=2, cls=CompactJSONEncoder, ensure_ascii=False)
+            f.write('\n')
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
 
 # from https://gist.github.com/jannismain/e96666ca4f059c3e5bc28abb711b5c92
@@ -28,36 +46,58 @@ class CompactJSONEncoder(json.JSONEncoder):
             kwargs["indent"] = 4
         super().__init__(*args, **kwargs)
         self.indentation_level = 0
+        self._primitive_encoder = None
 
     def encode(self, o):
         """Encode JSON object *o* with respect to single line lists."""
+        return "".join(self.iterencode(o))
+
+    def iterencode(self, o, **kwargs):
+        """Required to also work with `json.dump`.
+
+        Yields the document fragment by fragment while walking *o*, so that
+        `json.dump` writes them as they come.
+        """
         if isinstance(o, (list, tuple)):
-            return self._encode_list(o)
-        if isinstance(o, dict):
-            return self._encode_object(o)
-        return json.dumps(
-            o,
-            skipkeys=self.skipkeys,
-            ensure_ascii=self.ensure_ascii,
-            check_circular=self.check_circular,
-            allow_nan=self.allow_nan,
-            sort_keys=self.sort_keys,
-            indent=self.indent,
-            separators=(self.item_separator, self.key_separator),
-            default=self.default if hasattr(self, "default") else None,
-        )
+            yield from self._iterencode_list(o)
+        elif isinstance(o, dict):
+            yield from self._iterencode_object(o)
+        else:
+            yield self._encode_primitive(o)
+
+    def _encode_primitive(self, o):
+        # same as `json.dumps(o, ...)` with the options of this encoder,
+        # without instantiating a new encoder for every value
+        if self._primitive_encoder is None:
+            self._primitive_encoder = json.JSONEncoder(
+                skipkeys=self.skipkeys,
+                ensure_ascii=self.ensure_ascii,
+                check_circular=self.check_circular,
+                allow_nan=self.allow_nan,
+                sort_keys=self.sort_keys,
+                indent=self.indent,
+                separators=(self.item_separator, self.key_separator),
+                default=self.default if hasattr(self, "default") else None,
+            )
+        return self._primitive_encoder.encode(o)
 
-    def _encode_list(self, o):
+    def _iterencode_list(self, o):
         if self._put_on_single_line(o):
-            return "[" + ", ".join(self.encode(el) for el in o) + "]"
+            yield "[" + ", ".join(self._encode_primitive(el) for el in o) + "]"
+            return
         self.indentation_level += 1
-        output = [self.indent_str + self.encode(el) for el in o]
+        indent_str = self.indent_str
+        yield "[\n"
+        for index, el in enumerate(o):
+            yield ",\n" + indent_str if index else indent_str
+            yield from self.iterencode(el)
         self.indentation_level -= 1
-        return "[\n" + ",\n".join(output) + "\n" + self.indent_str + "]"
+        yield "\n" + self.indent_str + "]"
 
-    def _encode_object(self, o):
+    def _iterencode_object(self, o):
         if not o:
-            return "{}"
+            yield "{}"
+            return
 
         # ensure keys are converted to strings
         o = {str(k) if k is not None else "null": v for k, v in o.items()}
@@ -66,33 +106,53 @@ class CompactJSONEncoder(json.JSONEncoder):
             o = dict(sorted(o.items(), key=lambda x: x[0]))
 
         if self._put_on_single_line(o):
-            return (
+            yield (
                 "{ "
                 + ", ".join(
-                    f"{json.dumps(k)}: {self.encode(el)}" for k, el in o.items()
+                    f"{encode_basestring_ascii(k)}: {self._encode_primitive(el)}" for k, el in o.items()
                 )
                 + " }"
             )
+            return
 
         self.indentation_level += 1
-        output = [
-            f"{self.indent_str}{json.dumps(k)}: {self.encode(v)}" for k, v in o.items()
-        ]
+        indent_str = self.indent_str
+        yield "{\n"
+        for index, (k, v) in enumerate(o.items()):
+            yield (",\n" + indent_str if index else indent_str) + encode_basestring_ascii(k) + ": "
+            yield from self.iterencode(v)
         self.indentation_level -= 1
-
-        return "{\n" + ",\n".join(output) + "\n" + self.indent_str + "}"
-
-    def iterencode(self, o, **kwargs):
-        """Required to also work with `json.dump`."""
-        return self.encode(o)
+        yield "\n" + self.indent_str + "}"
 
     def _put_on_single_line(self, o):
         return (
             self._primitives_only(o)
             and len(o) <= self.MAX_ITEMS
-            and len(str(o)) - 2 <= self.MAX_WIDTH
+            and self._single_line_width(o) <= self.MAX_WIDTH
         )
 
+    def _single_line_width(self, o):
+        """Width of `str(o)` without its brackets, only measured until it
+        exceeds MAX_WIDTH. `o` only contains primitives."""
+        if not o:
+            return 0
+        if isinstance(o, dict):
+            # "k: v" items separated by ", "
+            parts = (part for item in o.items() for part in item)
+            width = 2 * len(o) + 2 * (len(o) - 1)
+        else:
+            parts = o
+            # a single item tuple has a trailing comma: (1,)
+            width = 2 * (len(o) - 1) + (isinstance(o, tuple) and len(o) == 1)
+        for part in parts:
+            if width > self.MAX_WIDTH:
+                break
+            if type(part) is str and width + len(part) + 2 > self.MAX_WIDTH:
+                # the repr of a string is at least its length plus the quotes
+                return self.MAX_WIDTH + 1
+            width += len(repr(part))
+        return width
+
     def _primitives_only(self, o: list | tuple | dict):
         if isinstance(o, (list, tuple)):
             return not any(isinstance(el, self.CONTAINER_TYPES) for el in o)
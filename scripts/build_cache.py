@@ -0,0 +1,90 @@
+# Local cache of the files copied by `copy_build`.
+# An entry is a directory holding the final o_spreadsheet.js/xml/css/scss files,
+# keyed by the o-spreadsheet commit and the options that alter those files.
+# Entries are evicted least recently used first once the cache exceeds
+# BUILD_CACHE_MAX_SIZE.
+import os
+import shutil
+import hashlib
+import tempfile
+
+from const import BUILD_CACHE_PATH, BUILD_CACHE_MAX_SIZE
+from repo import get_repo
+
+# written in the build folder by `run_build` when the working tree is clean
+BUILD_COMMIT_FILE = ".sp_tool_commit"
+
+
+def cache_key(commit: str, lib_file_name: str, stylesheet: str, transpile: bool) -> str:
+    raw = f"{commit}:{lib_file_name}:{stylesheet}:{int(transpile)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_clean_commit(repo_path):
+    """Return the HEAD commit hash of the repository if there are no
+    changes to tracked files, None otherwise."""
+    repo = get_repo(repo_path)
+    if repo.git("status", "--porcelain", "--untracked-files=no"):
+        return None
+    return repo.rev_parse("HEAD")
+
+
+def read_build_commit(build_path):
+    commit_file = os.path.join(build_path, BUILD_COMMIT_FILE)
+    if not os.path.isfile(commit_file):
+        return None
+    with open(commit_file) as f:
+        return f.read().strip() or None
+
+
+def write_build_commit(build_path, commit):
+    with open(os.path.join(build_path, BUILD_COMMIT_FILE), "w") as f:
+        f.write(commit)
+
+
+def restore(key: str, destination_path: str) -> bool:
+    entry = os.path.join(BUILD_CACHE_PATH, key)
+    if not os.path.isdir(entry):
+        return False
+    for file in os.listdir(entry):
+        shutil.copy(os.path.join(entry, file), destination_path)
+    # mark the entry as recently used
+    os.utime(entry)
+    return True
+
+
+def store(key: str, source_path: str, files: "list[str]"):
+    entry = os.path.join(BUILD_CACHE_PATH, key)
+    if os.path.isdir(entry):
+        os.utime(entry)
+        return
+    os.makedirs(BUILD_CACHE_PATH, exist_ok=True)
+    tmp_entry = tempfile.mkdtemp(dir=BUILD_CACHE_PATH, prefix=".tmp-")
+    try:
+        for file in files:
+            shutil.copy(os.path.join(source_path, file), tmp_entry)
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # another process stored the same entry in the meantime
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        return
+    evict()
+
+
+def evict(max_size: int = BUILD_CACHE_MAX_SIZE):
+    entries = []
+    total_size = 0
+    for name in os.listdir(BUILD_CACHE_PATH):
+        entry = os.path.join(BUILD_CACHE_PATH, name)
+        if name.startswith(".") or not os.path.isdir(entry):
+            continue
+        size = sum(
+            os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry)
+        )
+        entries.append((os.path.getmtime(entry), size, entry))
+        total_size += size
+    for _, size, entry in sorted(entries):
+        if total_size <= max_size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total_size -= size
@@ -3,5 +3,5 @@ from .release import release
 from .list_pr import list_pr
 from .push import push
 from .update import update
-from .benchmark import benchmark
+from .benchmark import benchmark, benchmark_odoo, benchmark_history
 from .gh_pages import gh_pages
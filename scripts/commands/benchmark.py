@@ -1,5 +1,160 @@
 # Will run the benchmark
-from helpers import run_benchmark
+import os
+import sys
+import json
+import subprocess
+import hashlib
+import datetime
+import configparser
+import tempfile
+
+from helpers import run_benchmark, print_table
+import spreadsheet_benchmark
+from spreadsheet_benchmark import store
+
 
 def benchmark():
-    run_benchmark()
+    fd, results_path = tempfile.mkstemp(prefix="sp_benchmark_", suffix=".json")
+    os.close(fd)
+    run_benchmark(results_path)
+    if os.path.getsize(results_path):
+        results = spreadsheet_benchmark.load_results(results_path)
+        results["dataset"] = {"target": "benchmark_target.js", "sha1": _benchmark_target_hash()}
+        spreadsheet_benchmark.print_report(results["settings"]["branches"], results["trials"])
+        run_id = store.save_run(results, "node")
+        print(f"Stored as run {run_id}")
+    os.remove(results_path)
+
+
+def _benchmark_target_hash():
+    """The node benchmark dataset is the code of the target and of the dataset factory"""
+    root_path = os.path.split(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))[0]
+    sha1 = hashlib.sha1()
+    for file in ["benchmark_target.js", "dataset_factory.js"]:
+        with open(os.path.join(root_path, "benchmark", file), "rb") as f:
+            sha1.update(f.read())
+    return sha1.hexdigest()
+
+
+def benchmark_history(target=None, event=None, branch=None, threshold=0.05, window=5, all_machines=False):
+    """Print the median of every stored run, by target, event and branch, and
+    flag the regressions relative to the rolling baseline of the previous runs.
+    Only the runs of this machine are shown unless `all_machines`."""
+    machine = None if all_machines else store.machine_fingerprint()
+    history = store.get_history(machine, target, event, branch)
+    if not history:
+        print("No stored benchmark run" + ("" if all_machines else " on this machine"))
+        return
+    regressions = 0
+    for (target_name, event_name), points in history.items():
+        print(f"\n{target_name}\nEvent: {event_name}")
+        rows = []
+        for branch_name in dict.fromkeys(point["branch"] for point in points):
+            series = [point for point in points if point["branch"] == branch_name]
+            for point in store.flag_regressions(series, threshold, window):
+                regressions += point["regression"]
+                rows.append([
+                    datetime.datetime.fromtimestamp(point["created_at"]).strftime("%Y-%m-%d %H:%M"),
+                    point["run_id"],
+                    branch_name,
+                    (point["commit"] or "")[:10],
+                    point["n"],
+                    f"{point['median']:.2f} ms",
+                    f"{point['change']:+.1%}" if point["change"] is not None else "",
+                    "REGRESSION" if point["regression"] else "",
+                ])
+        print_table(["date", "run", "branch", "commit", "n", "median", f"vs last {window}", ""], rows)
+    print(f"\n{regressions} regression(s) above {threshold:.0%}")
+
+
+def benchmark_odoo(config: configparser.ConfigParser, settings: dict, database: str, workers: int = 1, port: int = 8069):
+    """Run the interleaved benchmark of o-spreadsheet branches loaded in Odoo.
+    The spreadsheet_benchmark test of custom-addons does the page loads, in
+    an odoo-bin started on `database`.
+    With several `workers`, the runs are shared between as many odoo-bin, each
+    one pinned to its own CPUs and serving on its own port from `port`."""
+    settings = spreadsheet_benchmark.load_settings(settings)
+    if workers == 1:
+        process, results_path = _start_odoo_worker(settings, _odoo_command(config, database) + ["-i", "spreadsheet_benchmark"])
+        if process.wait():
+            sys.exit(f"odoo-bin failed with exit code {process.returncode}")
+        if not os.path.getsize(results_path):
+            sys.exit("The benchmark did not produce any result, check the odoo logs")
+        print(f"Raw results: {results_path}")
+        return
+    if settings["adaptive"]:
+        sys.exit("The adaptive mode needs all the runs in a single worker")
+    cpus = None
+    if hasattr(os, "sched_getaffinity"):
+        try:
+            cpus = spreadsheet_benchmark.split_cpus(workers)
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        print("CPU affinity is not supported on this platform, the workers are not pinned to CPUs")
+    targets = spreadsheet_benchmark.get_targets(settings)
+    settings["workers"] = workers
+    settings["builds"] = spreadsheet_benchmark.build_branches(config, settings["branches"], settings["version"])
+    settings["commits"] = spreadsheet_benchmark.resolve_commits(config, settings["branches"])
+    # install the module once, the workers only run the test
+    try:
+        subprocess.run(_odoo_command(config, database) + ["-i", "spreadsheet_benchmark", "--stop-after-init"], check=True)
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"odoo-bin failed with exit code {e.returncode}")
+    processes = []
+    for worker, schedule in enumerate(spreadsheet_benchmark.split_schedules(settings, targets)):
+        cmd = _odoo_command(config, database) + [f"--http-port={port + worker}"]
+        worker_settings = {**settings, "worker": worker, "schedule": schedule}
+        processes.append(_start_odoo_worker(worker_settings, cmd, cpus and cpus[worker]))
+    trials = []
+    failed = []
+    for worker, (process, results_path) in enumerate(processes):
+        if process.wait() or not os.path.getsize(results_path):
+            failed.append(worker)
+            continue
+        results = spreadsheet_benchmark.load_results(results_path)
+        trials += [{**trial, "worker": worker} for trial in results["trials"]]
+    if failed:
+        sys.exit(f"Workers {', '.join(map(str, failed))} failed, check the odoo logs")
+    results = spreadsheet_benchmark.make_results(
+        {**settings, "schedule": None},
+        trials,
+        commits=settings["commits"],
+        dataset={"database": database, "targets": targets},
+    )
+    spreadsheet_benchmark.print_report(settings["branches"], trials)
+    spreadsheet_benchmark.print_worker_report(trials, cpus)
+    run_id = store.save_run(results, "odoo")
+    print(f"Stored as run {run_id}")
+
+
+def _odoo_command(config: configparser.ConfigParser, database: str) -> "list[str]":
+    root_path = os.path.split(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))[0]
+    odoo_path = config["odoo"]["repo_path"]
+    addons_path = ",".join([
+        os.path.join(odoo_path, "addons"),
+        config["enterprise"]["repo_path"],
+        os.path.join(root_path, "custom-addons"),
+    ])
+    return [
+        os.path.join(odoo_path, "odoo-bin"),
+        f"--addons-path={addons_path}",
+        "-d", database,
+    ]
+
+
+def _start_odoo_worker(settings: dict, cmd: "list[str]", cpus=None):
+    """Start odoo-bin running the benchmark test. Returns the process and the
+    path of its raw results."""
+    fd, results_path = tempfile.mkstemp(prefix="sp_benchmark_", suffix=".json")
+    os.close(fd)
+    env = {
+        **os.environ,
+        spreadsheet_benchmark.SETTINGS_ENV: json.dumps(settings),
+        spreadsheet_benchmark.RESULTS_ENV: results_path,
+    }
+    cmd = cmd + ["--test-tags=.test_spreadsheet_performance", "--stop-after-init"]
+    # odoo-bin and its Chrome inherit the CPU affinity
+    preexec_fn = (lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+    return subprocess.Popen(cmd, env=env, preexec_fn=preexec_fn), results_path
+
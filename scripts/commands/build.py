@@ -4,7 +4,7 @@
 import os
 import configparser
 
-from helpers import run_build, copy_build
+from helpers import build_and_copy
 from shared import get_spreadsheet_branch, get_version_info
 from utils import pushd
 
@@ -17,5 +17,4 @@ def build(config: configparser.ConfigParser):
     with pushd(spreadsheet_path):
         repo_path = config[repo]["repo_path"]
         full_path = os.path.join(repo_path, rel_path)
-        run_build(config)
-        copy_build(config, lib_file_name, full_path, stylesheet)
+        build_and_copy(config, lib_file_name, full_path, stylesheet)
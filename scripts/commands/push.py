@@ -6,8 +6,7 @@ import sys
 from helpers import (
     get_commits,
     checkout,
-    run_build,
-    copy_build,
+    build_and_copy,
     odoo_commit_title,
     commit_message
 )
@@ -48,8 +47,7 @@ def push(config: configparser.ConfigParser, local=False, forceBuild=False):
         rel_path, version) or "[IMP] o-spreadsheet: wip lib update"
     message = commit_message(title, body)
     checkout(repo_path, spreadsheet_branch)
-    run_build(config)
-    copy_build(config, lib_file_name, full_path, stylesheet)
+    build_and_copy(config, lib_file_name, full_path, stylesheet)
     with pushd(repo_path):
         subprocess.check_output(["git", "commit", "-am", message])
         if not local:
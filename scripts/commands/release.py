@@ -6,6 +6,7 @@ import re
 import json
 import configparser
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 from uuid import uuid4
 from helpers import (
@@ -18,83 +19,57 @@ from helpers import (
     spreadsheet_release_title,
     commit_message,
     print_msg,
+    print_table,
     check_remote_alignment
 )
 from utils import pushd
+from worktrees import worktree_config, install_node_modules
 
 
-def release(config: configparser.ConfigParser, versions: list[str]):
+def release(config: configparser.ConfigParser, versions: list[str], jobs: int = 1, fetched_within: float = 0):
     check_remote_alignment()
     # todo
     print("\n=== RELEASE O-SPREADSHEET ===\nThis may take a while ;-)\n")
-    spreadsheet_path = config["spreadsheet"]["repo_path"]
-    fetch_repositories(config, versions, True)
-    old_prs = []
-    new_prs = []
+    fetch_repositories(config, versions, True, fetched_within)
+    results = {}
     existing_prs = get_o_spreadsheet_release_prs(config)
     today = date.today()
     d = f"{str(today.day).zfill(2)}{str(today.month).zfill(2)}"
     h = str(uuid4())[:4]
 
+    to_release = []
     for version in versions:
-        text = f"Processing version {version}"
-        print(text)
-        print("=" * len(text))
         if version in existing_prs:
             print(
                 f"Branch {version} already has a pending release PR on odoo/o-spreadsheet. Skipping...\n"
             )
-            old_prs.append([version, existing_prs[version]])
+            results[version] = ["existing PR", existing_prs[version]]
             continue
-
-        # checkout o-spreadsheet
-        checkout(spreadsheet_path, version, force=True)
-        reset(spreadsheet_path, version)
-
-        # build commit message - build/cp dist - push on remote
-        with pushd(spreadsheet_path):
-            cmd = [
-                "git",
-                "log",
-                "--pretty=format:%h",
-                "-n",
-                "1",
-                "--grep",
-                "\\[REL\\]",
-            ]
-
-            hash = subprocess.check_output(cmd).decode("utf-8")
-            body = get_commits(spreadsheet_path,hash,version)
-            
-            if not body:
-                print_msg(
-                    f"No new commits for version {version}. Skipping release...\n", "WARNING"
+        to_release.append(version)
+
+    if jobs > 1:
+        # each version is released in its own worktree (with its own node_modules),
+        # prepared sequentially as they share the git directory of o-spreadsheet
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for version in to_release:
+                try:
+                    version_config = worktree_config(config, ["spreadsheet"], version)
+                except subprocess.CalledProcessError as e:
+                    results[version] = ["failed", str(e)]
+                    continue
+                futures[version] = executor.submit(
+                    _release_version_safe, version_config, version, f"{d}-{h}", True
                 )
-                continue
-
-            tag = increment_package_version(spreadsheet_path, version)
-            message = commit_message(spreadsheet_release_title(tag), body + "\n\nTask: 0")
-
-            # commit
-            release_branch = f"{version}-{tag}-release-{d}-{h}-BI"
-
-            subprocess.check_output(["git", "checkout", "-b", release_branch])
-            subprocess.check_output(["git", "commit", "-am", message])
-
-            cmd = [
-                "git",
-                "push",
-                "-u",
-                config["spreadsheet"]["remote"],
-                release_branch,
-            ]
-            subprocess.check_output(cmd)
-
-        # make Pr
-        url = make_PR(spreadsheet_path, version, auto=True)
-        new_prs.append([version, url])
+            for version, future in futures.items():
+                results[version] = future.result()
+    else:
+        for version in to_release:
+            results[version] = _release_version_safe(config, version, f"{d}-{h}")
 
     # print All PR's, split between new and old
+    old_prs = [[v, detail] for v, (status, detail) in results.items() if status == "existing PR"]
+    new_prs = [[v, detail] for v, (status, detail) in results.items() if status == "released"]
     if old_prs:
         print("\nAlready existing PRs:")
         print(
@@ -106,9 +81,92 @@ def release(config: configparser.ConfigParser, versions: list[str]):
     if not (old_prs or new_prs):
         print("Every versions are up-to-date")
 
+    print("\nSummary:")
+    print_table(
+        ["version", "status", "details"],
+        [[version, *results[version]] for version in versions if version in results],
+    )
+    if any(status == "failed" for status, _ in results.values()):
+        print_msg("Some versions could not be released", "FAIL")
+
     return True
 
 
+def _release_version_safe(config: configparser.ConfigParser, version: str, branch_suffix: str, in_worktree=False):
+    """Release a version without letting its failure abort the other ones.
+    Returns a [status, details] pair."""
+    try:
+        url = release_version(config, version, branch_suffix, in_worktree)
+    except (Exception, SystemExit) as e:
+        print_msg(f"Release of version {version} failed: {e}", "FAIL")
+        return ["failed", str(e)]
+    if not url:
+        return ["up-to-date", ""]
+    return ["released", url]
+
+
+def release_version(config: configparser.ConfigParser, version: str, branch_suffix: str, in_worktree=False):
+    """Make a release commit on the given version and open its PR.
+    Returns the url of the PR, or None if there is nothing to release.
+
+    With `in_worktree`, the o-spreadsheet repository of `config` is a worktree
+    already checked out on the remote version (see `worktrees.worktree_config`).
+    """
+    text = f"Processing version {version}"
+    print(text)
+    print("=" * len(text))
+    spreadsheet_path = config["spreadsheet"]["repo_path"]
+
+    if in_worktree:
+        install_node_modules(spreadsheet_path)
+    else:
+        # checkout o-spreadsheet
+        checkout(spreadsheet_path, version, force=True)
+        reset(spreadsheet_path, version)
+
+    # build commit message - build/cp dist - push on remote
+    with pushd(spreadsheet_path):
+        cmd = [
+            "git",
+            "log",
+            "--pretty=format:%h",
+            "-n",
+            "1",
+            "--grep",
+            "\\[REL\\]",
+        ]
+
+        hash = subprocess.check_output(cmd).decode("utf-8")
+        body = get_commits(spreadsheet_path, hash, "HEAD")
+
+        if not body:
+            print_msg(
+                f"No new commits for version {version}. Skipping release...\n", "WARNING"
+            )
+            return None
+
+        tag = increment_package_version(spreadsheet_path, version)
+        message = commit_message(spreadsheet_release_title(tag), body + "\n\nTask: 0")
+
+        # commit
+        release_branch = f"{version}-{tag}-release-{branch_suffix}-BI"
+
+        subprocess.check_output(["git", "checkout", "-b", release_branch])
+        subprocess.check_output(["git", "commit", "-am", message])
+
+        cmd = [
+            "git",
+            "push",
+            "-u",
+            config["spreadsheet"]["remote"],
+            release_branch,
+        ]
+        subprocess.check_output(cmd)
+
+    # make Pr
+    return make_PR(spreadsheet_path, version, auto=True)
+
+
 def increment_package_version(path, branch_version):
     package_path = os.path.join(path, "package.json")
     with open(package_path, "r") as f:
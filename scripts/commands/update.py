@@ -1,127 +1,85 @@
 import configparser
 import subprocess
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date
 from uuid import uuid4
-from shared import spreadsheet_odoo_versions
-from utils import pushd, get_o_spreadsheet_js_hash
+from shared import spreadsheet_odoo_versions, get_verbose
+from utils import read_git_bundle_info, get_o_spreadsheet_js_hash
+from repo import get_repo, git_timings
 from helpers import (
     checkout,
     get_commits,
-    copy_build,
+    build_and_copy,
     odoo_commit_title,
     fetch_repositories,
     get_odoo_prs,
     make_PR,
     reset,
-    run_build,
     print_msg,
+    print_table,
     commit_message,
     check_remote_alignment
 )
+from worktrees import worktree_config, install_node_modules
 from contributors import CONTRIBUTORS
 
 
-def update(config: configparser.ConfigParser, versions: list[str]):
+def update(config: configparser.ConfigParser, versions: list[str], jobs: int = 1, fetched_within: float = 0):
     check_remote_alignment()
     print("\n=== UPDATE ODOO ===\nThis may take a while ;-)\n")
-    spreadsheet_path = config["spreadsheet"]["repo_path"]
-    fetch_repositories(config, versions)
+    fetch_repositories(config, versions, fetched_within=fetched_within)
     old_prs = []
     new_prs = []
+    failed = []
     existing_prs = get_odoo_prs(config)
     today = date.today()
     d = f"{str(today.day).zfill(2)}{str(today.month).zfill(2)}"
     h = str(uuid4())[:4]
 
-    for version in versions:
-        [repo, version, rel_path, lib_file_name, stylesheet] = spreadsheet_odoo_versions[version]
-        text = f"Processing version {version}"
-        print(text)
-        print("=" * len(text))
-        if version in existing_prs:
-            print(
-                f"Branch {version} already has a pending PR on odoo/{repo}. Skipping...\n"
-            )
+    plan = plan_update(config, versions, existing_prs)
+    print_plan(plan)
+    to_update = []
+    for version, version_plan in plan.items():
+        if version_plan["action"] == "existing PR":
             old_prs.append([version, existing_prs[version]])
-            continue
-
-        repo_path = config[repo]["repo_path"]
-        full_path = os.path.join(repo_path, rel_path)
-        o_branch = f"{version}-spreadsheet-{d}-{h}-BI"
-
-        # checkout o-spreadsheet
-        checkout(spreadsheet_path, version)
-        reset(spreadsheet_path, version)
+        elif version_plan["action"] == "update":
+            to_update.append(version)
+        elif version_plan["action"] == "failed":
+            failed.append(version)
 
-        # checkout Odoo (Community/Enterprise) on update branch
-        checkout(repo_path, version, force=True)
-        reset(repo_path, version)
-
-        # build commit message - build/cp dist - push on remote
-        with pushd(repo_path):
-            full_file_path = os.path.join(full_path, "o_spreadsheet.js")
-            spreadsheet_hash = version
-            # check last commit on o-spreadsheet is a REL
-            with pushd(spreadsheet_path):
-                cmd = [
-                    "git",
-                    "log",
-                    "HEAD^..HEAD",
-                    "--pretty=format:%s",
-                ]
-                commit = subprocess.check_output(cmd).decode("utf-8")
-                if not commit.startswith("[REL]"):
-                    print_msg(
-                        f"""The last commit on o-spreadsheet in version {version} is not a release.\n"""
-                        """Defaulting on last [REL] commit...""", "WARNING"
-                    )
-                    cmd = [
-                        "git",
-                        "log",
-                        "--pretty=format:%h",
-                        "-n",
-                        "1",
-                        "--grep",
-                        "\\[REL\\]",
-                    ]
-                    spreadsheet_hash = subprocess.check_output(
-                        cmd).decode("utf-8")
-
-            # find all commits since last update
-            odoo_hash = get_o_spreadsheet_js_hash(full_file_path)
-            body = get_commits(spreadsheet_path, odoo_hash, spreadsheet_hash)
-            if not body:
-                print(
-                    f"Branch {version} is up-to-date on odoo/{repo}. Skipping...\n"
+    if jobs > 1:
+        # each version is processed in its own worktrees, prepared sequentially
+        # as they share the git directory of the main repositories
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for version in to_update:
+                repo = spreadsheet_odoo_versions[version][0]
+                try:
+                    version_config = worktree_config(config, ["spreadsheet", repo], version)
+                except subprocess.CalledProcessError as e:
+                    print_msg(f"Update of version {version} failed: {e}", "FAIL")
+                    failed.append(version)
+                    continue
+                o_branch = f"{version}-spreadsheet-{d}-{h}-BI"
+                futures[version] = executor.submit(
+                    update_version, version_config, version, o_branch, plan[version]["body"], True
                 )
-                continue
-
-            # Add contributors
-            body = body + "\n\n\n" + \
-                ("\n").join([("Co-authored-by: " + contributor)
-                             for contributor in CONTRIBUTORS])
-
-            commit_title = odoo_commit_title(rel_path, version)
-            message = commit_message(commit_title, body)
-            checkout(repo_path, o_branch)
-            # build & cp build
-            run_build(config)
-            copy_build(config, lib_file_name, full_path, stylesheet)
-            # commit
-            subprocess.check_output(["git", "commit", "-am", message])
-            cmd = [
-                "git",
-                "push",
-                "-u",
-                config[repo]["remote-dev"],
-                o_branch,
-            ]
-            subprocess.check_output(cmd)
-
-        # make Pr
-        url = make_PR(repo_path, version)
-        new_prs.append([version, url])
+            for version, future in futures.items():
+                try:
+                    url = future.result()
+                except (Exception, SystemExit) as e:
+                    print_msg(f"Update of version {version} failed: {e}", "FAIL")
+                    failed.append(version)
+                    continue
+                if url:
+                    new_prs.append([version, url])
+    else:
+        for version in to_update:
+            o_branch = f"{version}-spreadsheet-{d}-{h}-BI"
+            url = update_version(config, version, o_branch, plan[version]["body"])
+            if url:
+                new_prs.append([version, url])
 
     # print All PR's, split between new and old
     if old_prs:
@@ -134,7 +92,134 @@ def update(config: configparser.ConfigParser, versions: list[str]):
             "\n".join([f"\t{version} - <{url}>" for [version, url] in new_prs]))
         print(
             f"Runbot builds: <https://runbot.odoo.com/?search=spreadsheet-{d}-{h}-BI>")
-    if not (old_prs or new_prs):
+    if failed:
+        print_msg(f"\nFailed versions: {', '.join(failed)}", "FAIL")
+    if not (old_prs or new_prs or failed):
         print("Every versions are up-to-date")
+    if get_verbose() and jobs == 1:
+        print("\ngit calls:")
+        print_table(
+            ["command", "calls", "seconds"],
+            [[command, count, f"{total:.2f}"] for command, (count, total) in git_timings().items()],
+        )
 
     return True
+
+
+def plan_update(config: configparser.ConfigParser, versions: "list[str]", existing_prs: dict) -> "dict[str, dict]":
+    """What `update` has to do for each version, decided from the fetched remote
+    branches without any checkout: the hash in the o_spreadsheet.js bundle of
+    the odoo branch is compared to the last [REL] commit of the o-spreadsheet
+    branch. Versions are planned in parallel threads; the bundles are read from
+    git only when their blob is not in the cache of `read_git_bundle_info`.
+
+    The plan of a version holds its `action` ("existing PR", "up-to-date",
+    "update" or "failed"), the `odoo_hash` and `release_hash` compared, the
+    `body` of the commit message listing the new commits and a `note`.
+    """
+    spreadsheet_path = config["spreadsheet"]["repo_path"]
+    spreadsheet_repo = get_repo(spreadsheet_path)
+    spreadsheet_remote = config["spreadsheet"]["remote"]
+
+    def plan_version(version):
+        [repo, version, rel_path, _, _] = spreadsheet_odoo_versions[version]
+        version_plan = {"repo": repo, "odoo_hash": None, "release_hash": None, "body": "", "note": ""}
+        if version in existing_prs:
+            return {**version_plan, "action": "existing PR", "note": existing_prs[version]}
+        bundle_info = read_git_bundle_info(
+            get_repo(config[repo]["repo_path"]), f"{config[repo]['remote']}/{version}", f"{rel_path}o_spreadsheet.js"
+        )
+        if bundle_info is None:
+            return {**version_plan, "action": "failed", "note": f"no o_spreadsheet.js on odoo/{repo} {version}"}
+        version_plan["odoo_hash"] = bundle_info.get("hash")
+        spreadsheet_ref = f"{spreadsheet_remote}/{version}"
+        try:
+            version_plan["release_hash"] = spreadsheet_repo.git(
+                "log", "-n", "1", "--pretty=format:%h", "--grep", "\\[REL\\]", spreadsheet_ref
+            )
+            if not version_plan["odoo_hash"] or not version_plan["release_hash"]:
+                raise ValueError("release not found")
+            version_plan["body"] = get_commits(spreadsheet_path, version_plan["odoo_hash"], version_plan["release_hash"])
+        except (subprocess.CalledProcessError, ValueError):
+            return {**version_plan, "action": "failed", "note": "release not found"}
+        if not version_plan["body"]:
+            return {**version_plan, "action": "up-to-date"}
+        if spreadsheet_repo.rev_parse(spreadsheet_ref) != spreadsheet_repo.rev_parse(version_plan["release_hash"]):
+            version_plan["note"] = "last commit is not a release, using the last [REL] commit"
+        return {**version_plan, "action": "update"}
+
+    with ThreadPoolExecutor() as executor:
+        return dict(zip(versions, executor.map(plan_version, versions)))
+
+
+def print_plan(plan: "dict[str, dict]"):
+    rows = []
+    for version, version_plan in plan.items():
+        commits = version_plan["body"].count("https://github.com/odoo/o-spreadsheet/commit/")
+        rows.append([
+            version,
+            version_plan["repo"],
+            version_plan["odoo_hash"] or "",
+            version_plan["release_hash"] or "",
+            commits or "",
+            version_plan["action"],
+            version_plan["note"],
+        ])
+    print("Plan:")
+    print_table(["version", "repo", "odoo", "release", "commits", "action", ""], rows)
+    to_update = [version for version, version_plan in plan.items() if version_plan["action"] == "update"]
+    print(f"\n{len(to_update)} version(s) to check out, build and push: {', '.join(to_update) or '-'}\n")
+
+
+def update_version(config: configparser.ConfigParser, version: str, o_branch: str, body: str, in_worktree=False):
+    """Build o-spreadsheet and push it on a new branch of odoo for the given version.
+    `body` lists the new o-spreadsheet commits, see `plan_update`.
+    Returns the url of the PR created.
+
+    With `in_worktree`, the repositories of `config` are worktrees already checked
+    out on the remote version (see `worktrees.worktree_config`).
+    """
+    [repo, version, rel_path, lib_file_name, stylesheet] = spreadsheet_odoo_versions[version]
+    text = f"Processing version {version}"
+    print(text)
+    print("=" * len(text))
+    spreadsheet_path = config["spreadsheet"]["repo_path"]
+    repo_path = config[repo]["repo_path"]
+    full_path = os.path.join(repo_path, rel_path)
+
+    if not in_worktree:
+        # checkout o-spreadsheet
+        checkout(spreadsheet_path, version)
+        reset(spreadsheet_path, version)
+
+        # checkout Odoo (Community/Enterprise) on update branch
+        checkout(repo_path, version, force=True)
+        reset(repo_path, version)
+
+    # build commit message - build/cp dist - push on remote
+    odoo_repo = get_repo(repo_path)
+
+    # Add contributors
+    body = body + "\n\n\n" + \
+        ("\n").join([("Co-authored-by: " + contributor)
+                     for contributor in CONTRIBUTORS])
+
+    commit_title = odoo_commit_title(rel_path, version)
+    message = commit_message(commit_title, body)
+    if in_worktree:
+        odoo_repo.checkout("-b", o_branch)
+        install_node_modules(spreadsheet_path)
+    else:
+        checkout(repo_path, o_branch)
+    # build & cp build
+    build_and_copy(config, lib_file_name, full_path, stylesheet)
+    built_hash = get_o_spreadsheet_js_hash(os.path.join(full_path, "o_spreadsheet.js"))
+    head = get_repo(spreadsheet_path).rev_parse("HEAD")
+    if not built_hash or not head or not head.startswith(built_hash):
+        print_msg(f"The built o_spreadsheet.js has hash {built_hash}, o-spreadsheet is on {head}", "WARNING")
+    # commit
+    odoo_repo.git("commit", "-am", message)
+    odoo_repo.git("push", "-u", config[repo]["remote-dev"], o_branch)
+
+    # make Pr
+    return make_PR(repo_path, version)
@@ -2,7 +2,7 @@ import os
 import sys
 import configparser
 import subprocess
-from const import CONFIG_FILE_PATH
+from const import CONFIG_FILE_PATH, GH_BIN
 from utils import (
     guess_enterprise_repo,
     guess_spreadsheet_repo,
@@ -32,12 +32,12 @@ def get_config(path: str) -> configparser.ConfigParser:
 
 
 def check_gh():
-    if which("gh") is None:
+    if which(GH_BIN) is None:
         raise Exception(
             "Please configure github cli: https://github.com/cli/cli/blob/trunk/docs/install_linux.md"
         )
     try:
-        subprocess.check_output(["gh", "auth", "status"])
+        subprocess.check_output([GH_BIN, "auth", "status"])
     except Exception as e:
         raise Exception("Please login on github cli: run `gh auth login`")
 
@@ -1,5 +1,23 @@
-from os import path
+from os import path, environ
 
 USER_HOME = path.expanduser('~')
 CONFIG_FILE_PATH = path.join(USER_HOME, ".spConfig.ini")
 DIFF_VALID_PATH = ["src", "package", "tests"]
+
+CACHE_PATH = path.join(
+    environ.get("XDG_CACHE_HOME", path.join(USER_HOME, ".cache")), "sp_tool"
+)
+BUILD_CACHE_PATH = path.join(CACHE_PATH, "builds")
+BUILD_CACHE_MAX_SIZE = 2 * 1024 ** 3  # bytes
+WORKTREES_PATH = path.join(CACHE_PATH, "worktrees")
+# allows to replace the GitHub CLI, e.g. by a stub
+GH_BIN = environ.get("SP_TOOL_GH", "gh")
+PRS_CACHE_PATH = path.join(CACHE_PATH, "prs.json")
+PRS_CACHE_TTL = 10 * 60  # seconds
+# info of the o_spreadsheet.js bundles read from git, by blob id
+BUNDLE_INFO_CACHE_PATH = path.join(CACHE_PATH, "bundle_info.json")
+# time of the last fetch of every remote ref, by repository
+FETCHES_PATH = path.join(CACHE_PATH, "fetches.json")
+BENCHMARK_STORE_PATH = path.join(
+    environ.get("XDG_DATA_HOME", path.join(USER_HOME, ".local", "share")), "sp_tool", "benchmarks.sqlite"
+)
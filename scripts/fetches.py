@@ -0,0 +1,150 @@
+# Fetch of the o-spreadsheet, odoo and enterprise repositories.
+# The repositories are fetched at the same time, each `git fetch --progress`
+# reporting on its own line. The time of the last fetch of every ref is kept
+# on disk so that a command run shortly after another one (e.g. `update`
+# after `release`) can skip the fetch of the large odoo repositories.
+import os
+import re
+import sys
+import json
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from const import FETCHES_PATH
+from repo import get_repo
+
+
+def fetch_repositories(config, versions, spreadsheet_only=False, fetched_within=0):
+    """Fetch the `versions` branches of the repositories. A repository whose
+    branches were all fetched less than `fetched_within` minutes ago is skipped."""
+    repos = ["spreadsheet"] if spreadsheet_only else ["spreadsheet", "enterprise", "odoo"]
+    fetches = _read_fetches()
+    to_fetch = []
+    for name in repos:
+        path = get_repo(config[name]["repo_path"]).path
+        refs = [f"{config[name]['remote']}/{version}" for version in versions]
+        last_fetch = min((fetches.get(path, {}).get(ref, 0) for ref in refs), default=0)
+        if fetched_within and time.time() - last_fetch < fetched_within * 60:
+            minutes = int((time.time() - last_fetch) // 60)
+            print(f"{name} fetched {minutes} minute(s) ago, skipping fetch")
+        else:
+            to_fetch.append(name)
+    if not to_fetch:
+        return
+
+    progress = _Progress(to_fetch)
+    with ThreadPoolExecutor(max_workers=len(to_fetch)) as executor:
+        results = dict(zip(to_fetch, executor.map(
+            lambda name: _fetch(config[name]["repo_path"], config[name]["remote"], versions, progress.reporter(name)),
+            to_fetch,
+        )))
+    progress.close()
+
+    fetches = _read_fetches()
+    for name, returncode in results.items():
+        if not returncode:
+            path = get_repo(config[name]["repo_path"]).path
+            fetches.setdefault(path, {}).update(
+                {f"{config[name]['remote']}/{version}": time.time() for version in versions}
+            )
+    _write_fetches(fetches)
+    for name, returncode in results.items():
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, ["git", "fetch", config[name]["remote"], *versions])
+
+
+def _fetch(path, remote, versions, report) -> int:
+    """Fetch the versions from the remote, reporting the progress lines of git.
+    Returns the exit code of git."""
+    repo = get_repo(path)
+    # only advertise the local tips of the fetched versions, instead of every
+    # local branch, so that the negotiation with the server stays short
+    tips = [
+        f"--negotiation-tip={remote}/{version}"
+        for version in versions
+        if repo.rev_parse(f"{remote}/{version}^{{commit}}")
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        ["git", "fetch", "--progress", *tips, remote, *versions],
+        cwd=repo.path,
+        stderr=subprocess.PIPE,
+    )
+    line = b""
+    # git rewrites its progress lines with "\r"
+    for chunk in iter(lambda: process.stderr.read1(4096), b""):
+        *lines, line = re.split(rb"[\r\n]", line + chunk)
+        for text in lines:
+            if text.strip():
+                report(text.decode("utf-8", errors="replace"))
+    if line.strip():
+        report(line.decode("utf-8", errors="replace"))
+    returncode = process.wait()
+    repo.timings.append(("fetch", time.perf_counter() - start))
+    # the refs moved
+    repo.close()
+    report("done" if not returncode else f"failed with exit code {returncode}")
+    return returncode
+
+
+class _Progress:
+    """Last progress line of every fetch. On a terminal, the lines are redrawn
+    in place, otherwise only the first and last lines of every step are printed."""
+
+    def __init__(self, names: "list[str]"):
+        self.names = names
+        self.lines = {}
+        self.live = sys.stdout.isatty()
+        self.lock = threading.Lock()
+        self.drawn = False
+        self.width = max(len(name) for name in names)
+        self._draw()
+
+    def reporter(self, name):
+        return lambda line: self._report(name, line)
+
+    def _report(self, name, line):
+        with self.lock:
+            previous = self.lines.get(name)
+            if not self.live and previous and line.split(":")[0] != previous.split(":")[0]:
+                self._print(name, previous)
+            self.lines[name] = line
+            if self.live:
+                self._draw()
+
+    def close(self):
+        with self.lock:
+            if not self.live:
+                for name in self.names:
+                    if name in self.lines:
+                        self._print(name, self.lines[name])
+
+    def _print(self, name, line):
+        print(f"{name.ljust(self.width)}  {line}")
+
+    def _draw(self):
+        if not self.live:
+            return
+        if self.drawn:
+            sys.stdout.write(f"\033[{len(self.names)}F")
+        for name in self.names:
+            sys.stdout.write("\033[2K")
+            self._print(name, self.lines.get(name, "waiting"))
+        sys.stdout.flush()
+        self.drawn = True
+
+
+def _read_fetches() -> dict:
+    try:
+        with open(FETCHES_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_fetches(fetches: dict):
+    os.makedirs(os.path.dirname(FETCHES_PATH), exist_ok=True)
+    with open(FETCHES_PATH, "w") as f:
+        json.dump(fetches, f)
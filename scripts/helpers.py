@@ -7,9 +7,14 @@ import shutil
 import pprint
 import json
 import pathlib
-
-from shared import spreadsheet_odoo_versions
-from const import DIFF_VALID_PATH
+import tempfile
+from functools import partial
+
+import build_cache
+from const import DIFF_VALID_PATH, GH_BIN
+from pull_requests import get_open_prs, clear_cache as clear_prs_cache
+from repo import get_repo
+from fetches import fetch_repositories
 from utils import pushd, retry_cmd
 from shared import get_version_info, get_verbose
 
@@ -19,126 +24,85 @@ pp = pprint.PrettyPrinter(depth=30)
 
 def checkout(exec_path, branch, force=False):
     is_verbose = get_verbose()
-    with pushd(exec_path):
-        try:
-            lingering_diff = subprocess.check_output(["git", "diff"]).decode(
-                "utf-8"
-            )
-            if lingering_diff:
-                if force:
-                    subprocess.check_output(
-                        ["git", "reset", "--hard", "HEAD"]
-                    ).decode("utf-8")
-                else:
-                    print_msg("You have unstaged changes. Please fix it", "FAIL")
-                    print_msg(f"Path:\n{exec_path}\n\n{lingering_diff}\n")
-                    print_msg("You have unstaged changes. Please fix it!", "FAIL")
-                    sys.exit(1)
-            subprocess.check_output(["git", "checkout", branch])
-        except subprocess.CalledProcessError as e:
-            [_, version, _, _, _] = get_version_info(branch)
-            is_verbose and print(
-                "Branch not found.\nCreating new local branch..."
-            )
-            is_verbose and print(f"Checkout base branch {version}")
-            subprocess.check_output(["git", "checkout", version])
-            # resets base on remote commit
-            # TODORAR smarter fetch. checkout should work with config, not an exec path, imho
-            subprocess.check_output(["git", "pull"])
-            is_verbose and print(f"Create branch {branch}")
-            subprocess.check_output(["git", "checkout", "-b", branch])
+    repo = get_repo(exec_path)
+    try:
+        lingering_diff = repo.git("diff")
+        if lingering_diff:
+            if force:
+                repo.reset_hard("HEAD")
+            else:
+                print_msg("You have unstaged changes. Please fix it", "FAIL")
+                print_msg(f"Path:\n{exec_path}\n\n{lingering_diff}\n")
+                print_msg("You have unstaged changes. Please fix it!", "FAIL")
+                sys.exit(1)
+        repo.checkout(branch)
+    except subprocess.CalledProcessError as e:
+        [_, version, _, _, _] = get_version_info(branch)
+        is_verbose and print(
+            "Branch not found.\nCreating new local branch..."
+        )
+        is_verbose and print(f"Checkout base branch {version}")
+        repo.checkout(version)
+        # resets base on remote commit
+        # TODORAR smarter fetch. checkout should work with config, not an exec path, imho
+        repo.git("pull")
+        is_verbose and print(f"Create branch {branch}")
+        repo.checkout("-b", branch)
 
 
 def reset(exec_path, branch):
-    with pushd(exec_path):
-        remote_branch = (
-            subprocess.check_output(
-                [
-                    "git",
-                    "rev-parse",
-                    "--abbrev-ref",
-                    "--symbolic-full-name",
-                    "@{u}",
-                ]
-            )
-            .decode("utf-8")
-            .rstrip("\n")
-        )
-        get_verbose() and print(f"resetting {branch} on {remote_branch} ...")
-        subprocess.check_output(["git", "reset", "--hard", remote_branch])
+    repo = get_repo(exec_path)
+    remote_branch = repo.git(
+        "rev-parse",
+        "--abbrev-ref",
+        "--symbolic-full-name",
+        "@{u}",
+    ).rstrip("\n")
+    get_verbose() and print(f"resetting {branch} on {remote_branch} ...")
+    repo.reset_hard(remote_branch)
 
 
 def get_odoo_prs(config: configparser.ConfigParser):
-    prs = {}
-    for repo in ["enterprise", "odoo"]:
-        path = config[repo]["repo_path"]
-        with pushd(path):
-            for version in spreadsheet_odoo_versions.keys():
-                existing_prs = subprocess.check_output(
-                    [
-                        "gh",
-                        "pr",
-                        "list",
-                        "--search",
-                        f"base:{version} is:open update o_spreadsheet to latest version",
-                    ]
-                ).decode("utf-8")
-                if existing_prs:
-                    url = "https://github.com/odoo/%s/pull/%s" % (
-                        repo,
-                        existing_prs.split("\t")[0],
-                    )
-                    prs[version] = url
-    return prs
+    prs = get_open_prs()
+    return {**prs["enterprise"], **prs["odoo"]}
 
 
 def get_o_spreadsheet_release_prs(config: configparser.ConfigParser):
-    prs = {}
-    path = config["spreadsheet"]["repo_path"]
-    with pushd(path):
-        for version in spreadsheet_odoo_versions.keys():
-            existing_prs = subprocess.check_output(
-                [
-                    "gh",
-                    "pr",
-                    "list",
-                    "--search",
-                    f"base:{version} is:open [REL]in:title",
-                ]
-            ).decode("utf-8")
-            if existing_prs:
-                url = "https://github.com/odoo/o-spreadsheet/pull/%s" % (
-                    existing_prs.split("\t")[0],
-                )
-                prs[version] = url
-    return prs
+    return get_open_prs()["o-spreadsheet"]
 
 
-def get_commits(path, old, new):
-    with pushd(path):
-        cmd = ["git", "diff", "--name-only", old, new]
-        diff_file_paths = (
-            subprocess.check_output(cmd).decode("utf-8").split("\n")
-        )
-        diff_files = any(
-            [
-                any([file_path.startswith(path) for path in DIFF_VALID_PATH])
-                for file_path in diff_file_paths
-            ]
-        )
-        if not diff_files:
-            return ""
-        cmd = [
-            "git",
-            "log",
-            f"{old}..{new}",
-            "--pretty=format:https://github.com/odoo/o-spreadsheet/commit/%h %s [%(trailers:key=Task,separator=%20)](https://www.odoo.com/odoo/2328/tasks/%(trailers:key=Task,separator=%20,valueonly))",
-        ]
+COMMIT_LINE_FORMAT = "https://github.com/odoo/o-spreadsheet/commit/%h %s [%(trailers:key=Task,separator=%20)](https://www.odoo.com/odoo/2328/tasks/%(trailers:key=Task,separator=%20,valueonly))"
 
-        commits = subprocess.check_output(cmd).decode("utf-8")
-        if not commits:
-            return ""
-        return f"### Contains the following commits:\n\n{commits}"
+# commits listed between two resolved hashes, by repository
+_commits_cache = {}
+
+
+# paths starting with one of DIFF_VALID_PATH, e.g. "package" also matches
+# package.json and "src" every file of src/
+DIFF_VALID_PATHSPECS = [
+    pathspec
+    for prefix in DIFF_VALID_PATH
+    for pathspec in (f":(glob){prefix}*", f":(glob){prefix}*/**")
+]
+
+
+def get_commits(path, old, new):
+    """Body listing the commits of old..new touching a path starting with one
+    of DIFF_VALID_PATH, or "" if there are none. Cached by the hashes `old` and
+    `new` resolve to."""
+    repo = get_repo(path)
+    key = (repo.path, repo.rev_parse(f"{old}^{{commit}}"), repo.rev_parse(f"{new}^{{commit}}"))
+    if None not in key and key in _commits_cache:
+        return _commits_cache[key]
+    lines = [
+        line
+        for line in repo.stream("log", f"{old}..{new}", f"--pretty=format:{COMMIT_LINE_FORMAT}", "--", *DIFF_VALID_PATHSPECS)
+        if line
+    ]
+    body = "### Contains the following commits:\n\n" + "\n".join(lines) if lines else ""
+    if None not in key:
+        _commits_cache[key] = body
+    return body
 
 
 def spreadsheet_release_title(tag):
@@ -191,7 +155,10 @@ def run_build(config: configparser.ConfigParser):
             # cleans previous dist
             if os.path.isdir("build"):
                 shutil.rmtree("build")
+            commit = build_cache.get_clean_commit(".")
             subprocess.check_output(["npm", "run", "build"])
+            if commit:
+                build_cache.write_build_commit("build", commit)
         except Exception as e:
             pp.pprint(e.cmd)
             pp.pprint(e.returncode)
@@ -213,20 +180,52 @@ def copy_build(config: configparser.ConfigParser, lib_file_name: str, destinatio
             files.append("o_spreadsheet.scss")
         if (stylesheet == "CSS"):
             files.append("o_spreadsheet.css")
+        copied_files = []
         for file in files:
             if os.path.isfile(file):
                 shutil.copy(file, destination_path)
+                copied_files.append(file if file != lib_file_name else "o_spreadsheet.js")
         shutil.move(f"{destination_path}/{lib_file_name}",
                     f"{destination_path}/o_spreadsheet.js")
         if lib_file_name.endswith(".esm.js"):
             transpile_esm_to_odoo_define(f"{destination_path}/o_spreadsheet.js")
+        commit = build_cache.read_build_commit(".")
+    if commit:
+        key = build_cache.cache_key(
+            commit, lib_file_name, stylesheet, lib_file_name.endswith(".esm.js")
+        )
+        build_cache.store(key, destination_path, copied_files)
+
+
+def restore_build(config: configparser.ConfigParser, lib_file_name: str, destination_path: str, stylesheet: str = "NO") -> bool:
+    """Copy the cached build of the current o-spreadsheet commit, if any.
+    Only a clean working tree is looked up in the cache."""
+    commit = build_cache.get_clean_commit(config["spreadsheet"]["repo_path"])
+    if not commit:
+        return False
+    key = build_cache.cache_key(
+        commit, lib_file_name, stylesheet, lib_file_name.endswith(".esm.js")
+    )
+    if not build_cache.restore(key, destination_path):
+        return False
+    print(f"Restored build of {commit[:8]} from cache")
+    return True
+
+
+def build_and_copy(config: configparser.ConfigParser, lib_file_name: str, destination_path: str, stylesheet: str = "NO"):
+    if restore_build(config, lib_file_name, destination_path, stylesheet):
+        return
+    run_build(config)
+    copy_build(config, lib_file_name, destination_path, stylesheet)
 
-def run_benchmark():
+def run_benchmark(results_path=None):
+    """Run the node benchmark. Its raw samples are written at `results_path` if given."""
     root_path = os.path.split(os.path.dirname(os.path.abspath(__file__)))[0]
+    env = {**os.environ, "BENCHMARK_RESULTS_PATH": results_path} if results_path else None
     with pushd(os.path.join(root_path, "benchmark")):
         try:
             # TODO un jour faire un truc propre pour printer en étape
-            result = subprocess.check_output(["node",  "--expose-gc", "start", "benchmark_worker.js"]).decode(
+            result = subprocess.check_output(["node",  "--expose-gc", "start", "benchmark_worker.js"], env=env).decode(
                 "utf-8"
             )
         except Exception as e:
@@ -236,16 +235,72 @@ def run_benchmark():
         print(result)
 
 def transpile_esm_to_odoo_define(path):
-    with open(path, "r") as f:
-        content = f.read()
-
-    content = convert_owl_imports(content)
-    content = convert_object_export(content)
-    index = content.index("*/")+2
-    content = LEADING_COMMENTS + "\n" + content[:index] + ODOO_DEFINE_OPEN + content[index:] + ODOO_DEFINE_CLOSE
-
-    with open(path, "w") as f:
-        f.write(content)
+    """Convert the ESM bundle at `path` to an odoo.define module.
+    The bundle is streamed by chunks of TRANSPILE_CHUNK_SIZE characters to a
+    temporary file which then replaces the original one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".o_spreadsheet-")
+    try:
+        with open(path, "r") as source, open(fd, "w") as target:
+            chunks = iter(partial(source.read, TRANSPILE_CHUNK_SIZE), "")
+            chunks = stream_sub(chunks, OWL_IMPORT_RE, OWL_IMPORT_REPL, OWL_IMPORT_TAIL)
+            chunks = stream_sub(chunks, EXPORT_OBJECT_RE, convert_object_export_match, 0)
+            target.write(LEADING_COMMENTS + "\n")
+            for chunk in insert_after_first(chunks, "*/", ODOO_DEFINE_OPEN):
+                target.write(chunk)
+            target.write(ODOO_DEFINE_CLOSE)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def stream_sub(chunks, regex, repl, tail):
+    """Equivalent of `regex.sub(repl, "".join(chunks))` yielding chunks.
+    Every match of `regex` must contain a "}" and end at most `tail` characters
+    after the first "}" following its start. Text up to the last "}" followed
+    by `tail` characters can then be substituted, the rest waits for the next chunk.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        cut = buffer.rfind("}", 0, max(len(buffer) - tail, 0)) + 1
+        if not cut:
+            continue
+        parts = []
+        position = 0
+        for match in regex.finditer(buffer):
+            if match.start() >= cut:
+                break
+            parts.append(buffer[position:match.start()])
+            parts.append(match.expand(repl) if isinstance(repl, str) else repl(match))
+            position = match.end()
+        end = max(position, cut)
+        parts.append(buffer[position:end])
+        yield "".join(parts)
+        buffer = buffer[end:]
+    yield regex.sub(repl, buffer)
+
+
+def insert_after_first(chunks, marker, text):
+    """Yield the chunks with `text` inserted after the first occurrence of `marker`"""
+    chunks = iter(chunks)
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        index = buffer.find(marker)
+        if index != -1:
+            index += len(marker)
+            yield buffer[:index]
+            yield text
+            yield buffer[index:]
+            yield from chunks
+            return
+    raise ValueError(f"{marker} not found")
+
+
+TRANSPILE_CHUNK_SIZE = 1024 * 1024
 
 LEADING_COMMENTS ="""// @odoo-module ignore
 // Transpiled AOT with https://github.com/rrahir/spreadsheet-tools"""
@@ -263,6 +318,11 @@ EXPORT_OBJECT_RE = re.compile(r"""
     (?P<object>{[\w$\s,]+})             # { a, b, c as x, ... }
     """, re.MULTILINE | re.VERBOSE)
 
+OWL_IMPORT_RE = re.compile(r'import {([^}]+)} from ["\']@odoo/owl["\'];')
+OWL_IMPORT_REPL = r"const {\1} = require('@odoo/owl');"
+# length of ` from "@odoo/owl";`, matched after the closing brace
+OWL_IMPORT_TAIL = 18
+
 
 def convert_object_export(content):
     """
@@ -271,10 +331,13 @@ def convert_object_export(content):
     // after
     Object.assign(__exports, { a, b, x: c })
     """
-    def repl(matchobj):
-        object_process = "{" + ",".join([convert_as(val) for val in matchobj["object"][1:-1].split(",")]) + "}"
-        return f"Object.assign(__exports, {object_process})"
-    return EXPORT_OBJECT_RE.sub(repl, content)
+    return EXPORT_OBJECT_RE.sub(convert_object_export_match, content)
+
+
+def convert_object_export_match(matchobj):
+    object_process = "{" + ",".join([convert_as(val) for val in matchobj["object"][1:-1].split(",")]) + "}"
+    return f"Object.assign(__exports, {object_process})"
+
 
 def convert_owl_imports(content):
     """
@@ -283,11 +346,7 @@ def convert_owl_imports(content):
     // after
     const { Component, useState } = require('@odoo/owl');
     """
-    return re.sub(
-        r'import {([^}]+)} from ["\']@odoo/owl["\'];',
-        r"const {\1} = require('@odoo/owl');",
-        content,
-    )
+    return OWL_IMPORT_RE.sub(OWL_IMPORT_REPL, content)
 
 def convert_as(val):
     parts = val.split(" as ")
@@ -301,49 +360,23 @@ def make_PR(path, version, **kwargs) -> str:
     print("making PR", version, path)
     with pushd(path):
         subprocess.check_output(
-            ["gh", "pr", "create", "--fill", "--base", version]
+            [GH_BIN, "pr", "create", "--fill", "--base", version]
         )
-        result = retry_cmd(["gh", "pr", "view", "--json", "url"], 3)
+        clear_prs_cache()
+        result = retry_cmd([GH_BIN, "pr", "view", "--json", "url"], 3)
         url = json.loads(result.decode("utf-8"))["url"]
 
         if stop:
             retry_cmd(
-                ["gh", "pr", "comment", url, "--body", "robodoo fw=no"], 3
+                [GH_BIN, "pr", "comment", url, "--body", "robodoo fw=no"], 3
             )
         if autoCommit:
             retry_cmd(
-                ["gh", "pr", "comment", url, "--body", "robodoo r+"], 3
+                [GH_BIN, "pr", "comment", url, "--body", "robodoo r+"], 3
             )
         return url
 
 
-def fetch_repositories(config, versions, spreadsheet_only=False):
-    spreadsheet_path = config["spreadsheet"]["repo_path"]
-
-    print("fetching o-spreadsheet ...")
-    with pushd(spreadsheet_path):
-        subprocess.check_output(
-            [
-                "git",
-                "fetch",
-                config["spreadsheet"]["remote"],
-            ]
-            + versions
-        )
-    if spreadsheet_only:
-        return
-    print("fetching enterprise ...")
-    with pushd(config["enterprise"]["repo_path"]):
-        subprocess.check_output(
-            ["git", "fetch", config["enterprise"]["remote"]] + versions
-        )
-    print("fetching odoo ...")
-    with pushd(config["odoo"]["repo_path"]):
-        subprocess.check_output(
-            ["git", "fetch", config["odoo"]["remote"]] + versions
-        )
-
-
 bcolors = {
     "HEADER": '\033[95m',
     "OKBLUE": '\033[94m',
@@ -364,33 +397,33 @@ def print_msg(text: str, level=False):
         print(text)
 
 
+def print_table(headers: "list[str]", rows: "list[list[str]]"):
+    widths = [
+        max(len(str(cell)) for cell in column) for column in zip(headers, *rows)
+    ]
+    for row in [headers, ["-" * width for width in widths], *rows]:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
 def commit_message(title: str, body: str) -> str:
     return f"{title}\n\n{body}"
 
 
 def check_remote_alignment():
-    root_dir = pathlib.Path(__file__).parent.parent
-
-    with pushd(root_dir):
-        subprocess.check_output(["git", "remote", "update"])
-        ###
-        # Check if the current branch was rebased on the remote master
-        ###
-
-        remote_name = subprocess.check_output(
-            ["git", "remote",],
-            text=True,
-        ).strip().splitlines()[0]  # assuming 'origin' is the first remote
-
-        branch_name = subprocess.check_output(
-            [
-                "git", "branch",
-                "--contains",
-                remote_name, # remote master HEAD hash
-                "master"
-            ],
-            text=True
-        ).strip()
-        if (not branch_name):
-            print_msg("Your local branch is not aligned with the remote branch master. Please pull the remote branch before continuing", "FAIL")
-            exit(1)
+    repo = get_repo(str(pathlib.Path(__file__).parent.parent))
+    repo.git("remote", "update")
+    ###
+    # Check if the current branch was rebased on the remote master
+    ###
+
+    remote_name = repo.git("remote").strip().splitlines()[0]  # assuming 'origin' is the first remote
+
+    branch_name = repo.git(
+        "branch",
+        "--contains",
+        remote_name, # remote master HEAD hash
+        "master",
+    ).strip()
+    if (not branch_name):
+        print_msg("Your local branch is not aligned with the remote branch master. Please pull the remote branch before continuing", "FAIL")
+        exit(1)
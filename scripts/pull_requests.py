@@ -0,0 +1,82 @@
+# Discovery of the open o_spreadsheet update and release pull requests.
+# The pull requests of every repository and base branch are fetched with a
+# single GraphQL query, and the result is cached on disk for PRS_CACHE_TTL
+# seconds so that successive commands do not query GitHub again.
+import os
+import json
+import time
+import subprocess
+
+from const import GH_BIN, PRS_CACHE_PATH, PRS_CACHE_TTL
+from shared import spreadsheet_odoo_versions
+
+# { repository: search terms of the pull requests to find }
+PR_SEARCHES = {
+    "enterprise": "update o_spreadsheet to latest version",
+    "odoo": "update o_spreadsheet to latest version",
+    "o-spreadsheet": "[REL] in:title",
+}
+
+
+def get_open_prs(use_cache=True) -> "dict[str, dict[str, str]]":
+    """Return the url of the open pull requests by repository and base branch
+    ```
+    { "odoo": { "17.0": "https://github.com/odoo/odoo/pull/123456" }, ... }
+    ```
+    """
+    versions = list(spreadsheet_odoo_versions.keys())
+    if use_cache:
+        prs = _read_cache(versions)
+        if prs is not None:
+            return prs
+    prs = fetch_open_prs(versions)
+    _write_cache(versions, prs)
+    return prs
+
+
+def fetch_open_prs(versions: "list[str]") -> "dict[str, dict[str, str]]":
+    searches = [
+        (repo, version, f"repo:odoo/{repo} is:pr is:open base:{version} {terms}")
+        for repo, terms in PR_SEARCHES.items()
+        for version in versions
+    ]
+    fields = "\n".join(
+        f"q{index}: search(query: {json.dumps(query)}, type: ISSUE, first: 1) "
+        "{ nodes { ... on PullRequest { url } } }"
+        for index, (_, _, query) in enumerate(searches)
+    )
+    result = subprocess.check_output(
+        [GH_BIN, "api", "graphql", "-f", f"query=query {{\n{fields}\n}}"]
+    )
+    data = json.loads(result.decode("utf-8"))["data"]
+    prs = {repo: {} for repo in PR_SEARCHES}
+    for index, (repo, version, _) in enumerate(searches):
+        nodes = data[f"q{index}"]["nodes"]
+        if nodes:
+            prs[repo][version] = nodes[0]["url"]
+    return prs
+
+
+def clear_cache():
+    # may be called by several processes at once, see `update --jobs`
+    try:
+        os.remove(PRS_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def _read_cache(versions):
+    try:
+        with open(PRS_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache["versions"] != versions or time.time() - cache["time"] > PRS_CACHE_TTL:
+        return None
+    return cache["prs"]
+
+
+def _write_cache(versions, prs):
+    os.makedirs(os.path.dirname(PRS_CACHE_PATH), exist_ok=True)
+    with open(PRS_CACHE_PATH, "w") as f:
+        json.dump({"time": time.time(), "versions": versions, "prs": prs}, f)
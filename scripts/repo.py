@@ -0,0 +1,154 @@
+# Handle on a local git repository.
+# Commands run with `cwd=` instead of changing the working directory of the
+# process, so that repositories can be used from several threads. Revisions
+# are resolved by a long-lived `git cat-file --batch-check` process and files
+# read by long-lived `git cat-file --batch` processes, one by thread so that
+# threads read in parallel. The duration of every call is recorded.
+import os
+import time
+import threading
+import subprocess
+
+_repos = {}
+_repos_lock = threading.Lock()
+
+
+def get_repo(path: str) -> "Repo":
+    """The shared Repo of `path`"""
+    path = os.path.abspath(os.path.expanduser(path))
+    with _repos_lock:
+        if path not in _repos:
+            _repos[path] = Repo(path)
+        return _repos[path]
+
+
+def git_timings() -> "dict[str, tuple[int, float]]":
+    """Number of calls and total duration by git command, for all the shared repos"""
+    summary = {}
+    with _repos_lock:
+        repos = list(_repos.values())
+    for repo in repos:
+        for command, duration in repo.timings:
+            count, total = summary.get(command, (0, 0.0))
+            summary[command] = (count + 1, total + duration)
+    return summary
+
+
+class Repo:
+    def __init__(self, path: str):
+        self.path = path
+        self.timings = []  # (command, seconds) of every call
+        self._batch = None
+        self._batch_lock = threading.Lock()
+        # `git cat-file --batch` process of each thread, restarted when refs move
+        self._contents = threading.local()
+        self._contents_processes = []
+        self._contents_generation = 0
+
+    def __repr__(self):
+        return f"Repo({self.path!r})"
+
+    def git(self, *args: str) -> str:
+        """Output of `git <args>`, raises CalledProcessError on failure"""
+        start = time.perf_counter()
+        try:
+            return subprocess.check_output(["git", *args], cwd=self.path).decode("utf-8")
+        finally:
+            self.timings.append((args[0], time.perf_counter() - start))
+            if args[0] in MUTATING_COMMANDS:
+                self._close_batch()
+
+    def stream(self, *args: str):
+        """Lines of the output of `git <args>`, yielded while git runs.
+        Raises CalledProcessError on failure once the output is read."""
+        start = time.perf_counter()
+        process = subprocess.Popen(["git", *args], cwd=self.path, stdout=subprocess.PIPE, text=True)
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+            self.timings.append((args[0], time.perf_counter() - start))
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, ["git", *args])
+
+    def rev_parse(self, revision: str) -> "str | None":
+        """Full hash of the object named `revision`, None if there is none"""
+        start = time.perf_counter()
+        with self._batch_lock:
+            if self._batch is None:
+                self._batch = subprocess.Popen(
+                    ["git", "cat-file", "--batch-check"],
+                    cwd=self.path,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                )
+            self._batch.stdin.write(revision + "\n")
+            self._batch.stdin.flush()
+            line = self._batch.stdout.readline().split()
+        self.timings.append(("cat-file", time.perf_counter() - start))
+        # "<hash> <type> <size>" or "<revision> missing"
+        if len(line) != 3:
+            return None
+        return line[0]
+
+    def show_file(self, revision: str, path: "str | None" = None) -> "bytes | None":
+        """Content of the file at `path` in `revision`, or of the object named
+        `revision` without `path`. None if there is none."""
+        start = time.perf_counter()
+        process = self._contents_process()
+        name = revision if path is None else f"{revision}:{path}"
+        process.stdin.write(f"{name}\n".encode("utf-8"))
+        process.stdin.flush()
+        # "<hash> <type> <size>" followed by the content and a newline, or "<object> missing"
+        header = process.stdout.readline().split()
+        content = None
+        if len(header) == 3:
+            content = process.stdout.read(int(header[2]) + 1)[:-1]
+        self.timings.append(("cat-file", time.perf_counter() - start))
+        return content
+
+    def current_branch(self) -> str:
+        return self.git("branch", "--show-current").strip()
+
+    def checkout(self, *args: str):
+        self.git("checkout", *args)
+
+    def reset_hard(self, revision: str):
+        self.git("reset", "--hard", revision)
+
+    def fetch(self, remote: str, refs: "list[str]" = ()):
+        self.git("fetch", remote, *refs)
+
+    def close(self):
+        self._close_batch()
+
+    def _contents_process(self) -> subprocess.Popen:
+        with self._batch_lock:
+            if getattr(self._contents, "generation", None) != self._contents_generation:
+                self._contents.process = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    cwd=self.path,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+                self._contents.generation = self._contents_generation
+                self._contents_processes.append(self._contents.process)
+            return self._contents.process
+
+    def _close_batch(self):
+        # refs moved: the batch processes may have cached the old ones
+        with self._batch_lock:
+            for process in [self._batch, *self._contents_processes]:
+                if process is not None:
+                    process.stdin.close()
+                    process.wait()
+            self._batch = None
+            self._contents_processes = []
+            self._contents_generation += 1
+
+
+# commands after which revisions must be resolved again
+MUTATING_COMMANDS = {"checkout", "reset", "fetch", "pull", "commit", "remote", "merge", "rebase"}
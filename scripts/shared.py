@@ -1,7 +1,6 @@
 import configparser
-import subprocess
 
-from utils import pushd
+from repo import get_repo
 
 VERBOSE = True
 
@@ -38,11 +37,7 @@ def get_spreadsheet_branch(config: configparser.ConfigParser) -> str:
     # git branch --show-current
     # as of git 2.22
     try:
-        with pushd(config["spreadsheet"]["repo_path"]):
-            branch = subprocess.check_output(
-                ["git", "branch", "--show-current"]
-            )
-            return branch.decode().strip()
+        return get_repo(config["spreadsheet"]["repo_path"]).current_branch()
     except Exception as e:
         print(f"Cannot get the branch for repo o-spreadsheet because {e}")
         exit(1)
@@ -8,7 +8,7 @@ import webbrowser
 
 from docopt import docopt
 
-from commands import list_pr, update, push, release, build, benchmark, gh_pages
+from commands import list_pr, update, push, release, build, benchmark, benchmark_odoo, benchmark_history, gh_pages
 from shared import set_verbose, spreadsheet_odoo_versions
 from versions import check_versions
 from config import get_config
@@ -27,14 +27,16 @@ def main():
     =================
 
     Usage:
-        sp_tool release [-s] [-t | -e] [TARGET...] [--config <path>]
-        sp_tool update [-s] [-t | -e] [TARGET...] [--config <path>]
+        sp_tool release [-s] [-t | -e] [TARGET...] [--jobs <n>] [--fetched-within <min>] [--config <path>]
+        sp_tool update [-s] [-t | -e] [TARGET...] [--jobs <n>] [--fetched-within <min>] [--config <path>]
         sp_tool build [-s] [--config <path>]
         sp_tool push [-l -f -s] [--config <path>]
         sp_tool list-pr [--config <path>]
         sp_tool process [--config <path>]
         sp_tool -h | --help | --version
         sp_tool benchmark
+        sp_tool benchmark odoo --db <db> (--branch <branch>)... [--document <id>]... [--url <url>]... [--runs <n>] [--warmup <n>] [--seed <n>] [--adaptive [--min-runs <n>] [--precision <pct>] [--time-budget <s>]] [--workers <n> [--port <port>]] [--config <path>]
+        sp_tool benchmark history [--target <url>] [--event <name>] [--branch <branch>] [--threshold <pct>] [--window <n>] [--all-machines] [--config <path>]
         sp_tool gh-pages
 
     Options:
@@ -45,6 +47,27 @@ def main():
         -s               silent mode
         -t               include branches
         -e               exclude branches
+        --jobs <n>       number of versions processed in parallel, each in its own git worktree [default: 1]
+        --fetched-within <min>  skip the fetch of the repositories fetched less than <min> minutes ago [default: 0]
+        --db <db>        odoo database in which the benchmark is run
+        --branch <branch>  o-spreadsheet branch (or commit) to benchmark
+        --document <id>  spreadsheet document to load
+        --url <url>      other odoo page to load
+        --runs <n>       measured runs of each branch on each page [default: 30]
+        --warmup <n>     runs of each branch on each page discarded before measuring [default: 2]
+        --seed <n>       seed of the random order of the runs
+        --adaptive       stop the runs once the confidence interval of every event is narrow enough, --runs is then
+                         the maximum number of runs
+        --min-runs <n>   minimum number of runs in adaptive mode [default: 5]
+        --precision <pct>  half-width of the confidence interval of the ratio to the first branch, in percent [default: 2]
+        --time-budget <s>  stop the adaptive runs after this number of seconds
+        --workers <n>    number of odoo-bin running the benchmark in parallel, each pinned to its own CPUs [default: 1]
+        --port <port>    http port of the first worker, the next ones use the following ports [default: 8069]
+        --target <url>   only show this benchmark target
+        --event <name>   only show this event
+        --threshold <pct>  slowdown flagged as a regression, in percent [default: 5]
+        --window <n>     number of previous runs making the rolling baseline [default: 5]
+        --all-machines   also show the runs of other machines
 
 
 
@@ -58,6 +81,9 @@ def main():
     sp_tool list-pr     # uses gh to find the list of Open PR about updating o_spreadsheet
     sp_tool process     # shows the workflow readme file
     sp_tool benchmark   # start the benchmark tool
+    sp_tool benchmark odoo  # compare o-spreadsheet branches loading spreadsheets in odoo, runs interleaved
+                            # in a random order
+    sp_tool benchmark history  # trends of the stored benchmark results, with regressions
     sp_tool gh-pages    # create a commit to update the gh-pages branch
     """
     arguments = docopt(main.__doc__, version="0.1.1", options_first=False)
@@ -87,6 +113,15 @@ def main():
     if arguments["-s"]:
         set_verbose(False)
 
+    try:
+        jobs = int(arguments["--jobs"])
+    except ValueError:
+        sys.exit("--jobs must be a number")
+    try:
+        fetched_within = float(arguments["--fetched-within"])
+    except ValueError:
+        sys.exit("--fetched-within must be a number")
+
     # command handling
     if arguments["--version"]:
         print(f"Version {arguments['version']}")
@@ -97,7 +132,7 @@ def main():
         exit(0)
 
     if arguments["update"]:
-        update(config, targetted_versions)
+        update(config, targetted_versions, jobs, fetched_within)
         exit(0)
 
     if arguments["push"]:
@@ -117,13 +152,55 @@ def main():
         exit(0)
 
     if arguments["release"]:
-        release(config, targetted_versions)
+        release(config, targetted_versions, jobs, fetched_within)
         exit(0)
 
     if arguments["build"]:
         build(config)
         exit(0)
 
+    if arguments["benchmark"] and arguments["history"]:
+        try:
+            threshold = float(arguments["--threshold"]) / 100
+            window = int(arguments["--window"])
+        except ValueError:
+            sys.exit("--threshold and --window must be numbers")
+        benchmark_history(
+            arguments["--target"],
+            arguments["--event"],
+            arguments["--branch"][0] if arguments["--branch"] else None,
+            threshold,
+            window,
+            arguments["--all-machines"],
+        )
+        exit(0)
+
+    if arguments["benchmark"] and arguments["odoo"]:
+        try:
+            settings = {
+                "branches": arguments["--branch"],
+                "documents": [int(document_id) for document_id in arguments["--document"]],
+                "urls": arguments["--url"],
+                "runs": int(arguments["--runs"]),
+                "warmup": int(arguments["--warmup"]),
+                "seed": int(arguments["--seed"]) if arguments["--seed"] else None,
+                "adaptive": arguments["--adaptive"],
+                "min_runs": int(arguments["--min-runs"]),
+                "precision": float(arguments["--precision"]) / 100,
+                "time_budget": float(arguments["--time-budget"]) if arguments["--time-budget"] else None,
+            }
+        except ValueError:
+            sys.exit("--document, --runs, --warmup, --seed, --min-runs, --precision and --time-budget must be numbers")
+        if not settings["documents"] and not settings["urls"]:
+            sys.exit("Please provide a --document or an --url to load")
+        try:
+            workers = int(arguments["--workers"])
+            port = int(arguments["--port"])
+        except ValueError:
+            sys.exit("--workers and --port must be numbers")
+        benchmark_odoo(config, settings, arguments["--db"], workers, port)
+        exit(0)
+
     if arguments["benchmark"]:
         benchmark()
         exit(0)
@@ -0,0 +1,25 @@
+# Interleaved A/B benchmark of o-spreadsheet builds loaded in Odoo.
+# The page loads themselves are run by the spreadsheet_benchmark addon test
+# (custom-addons/spreadsheet_benchmark), `sp_tool benchmark odoo` starts it.
+from .runner import (
+    SETTINGS_ENV,
+    RESULTS_ENV,
+    BUNDLE_PARAM,
+    load_settings,
+    get_targets,
+    build_branches,
+    resolve_commits,
+    iter_schedule,
+    make_schedule,
+    sequential_stop,
+    plan_trials,
+    split_schedules,
+    split_cpus,
+    install_bundles,
+    bundle_url,
+    run_trials,
+    make_results,
+    save_results,
+    load_results,
+)
+from .report import analyze, print_report, worker_variance, print_worker_report
@@ -0,0 +1,117 @@
+import math
+
+from helpers import print_table
+from . import stats
+
+
+def group_samples(branches: "list[str]", trials: "list[dict]") -> "dict[tuple[str, str], dict[str, list[float]]]":
+    """Timings by (target, event) then by branch"""
+    samples = {}
+    for trial in trials:
+        for event, value in trial["timings"].items():
+            by_branch = samples.setdefault((trial["target"], event), {branch: [] for branch in branches})
+            by_branch.setdefault(trial["branch"], []).append(value)
+    return samples
+
+
+def analyze(branches: "list[str]", trials: "list[dict]", alpha=0.05, effect=0.05) -> "list[dict]":
+    """Summary of each branch and comparison to the baseline, the first branch,
+    for every event of every target."""
+    baseline = branches[0]
+    analysis = []
+    for (target, event), by_branch in group_samples(branches, trials).items():
+        summaries = {branch: stats.summarize(values) for branch, values in by_branch.items() if values}
+        comparisons = {
+            branch: stats.compare(by_branch[baseline], values, alpha, effect)
+            for branch, values in by_branch.items()
+            if branch != baseline and values and by_branch[baseline]
+        }
+        required = [c["required_runs"] for c in comparisons.values() if c["required_runs"]]
+        analysis.append({
+            "target": target,
+            "event": event,
+            "summaries": summaries,
+            "comparisons": comparisons,
+            "required_runs": max(required) if required else None,
+        })
+    return analysis
+
+
+def print_report(branches: "list[str]", trials: "list[dict]", alpha=0.05, effect=0.05):
+    analysis = analyze(branches, trials, alpha, effect)
+    print(f"\nBenchmark Results (baseline: {branches[0]}):")
+    headers = ["branch", "n", "median", "trimmed mean", "cv", "outliers", "ratio [95% CI]", "p (MW)", "p (Welch)", ""]
+    target = None
+    for result in analysis:
+        if result["target"] != target:
+            target = result["target"]
+            print(f"\n{target}")
+        print(f"\nEvent: {result['event']}")
+        rows = []
+        for branch, summary in result["summaries"].items():
+            row = [
+                branch,
+                summary["n"],
+                f"{summary['median']:.2f} ms",
+                f"{summary['trimmed_mean']:.2f} ms",
+                f"{summary['cv'] * 100:.1f}%" + (" noisy" if summary["noisy"] else ""),
+                summary["outliers"],
+            ]
+            comparison = result["comparisons"].get(branch)
+            if comparison:
+                low, high = comparison["ci"]
+                row += [
+                    f"{comparison['ratio']:.3f} [{low:.3f}, {high:.3f}]",
+                    _format_p(comparison["p_mann_whitney"]),
+                    _format_p(comparison["p_welch"]),
+                    "*" if comparison["significant"] else "",
+                ]
+            else:
+                row += ["baseline", "", "", ""]
+            rows.append(row)
+        print_table(headers, rows)
+        if result["required_runs"]:
+            print(f"runs needed per branch to detect a {effect:.0%} difference: {result['required_runs']}")
+    print(f"\n* significant at {alpha}: Mann-Whitney p-value below it and confidence interval of the ratio excluding 1")
+
+
+def _format_p(p: float) -> str:
+    if math.isnan(p):
+        return "-"
+    return "<0.001" if p < 0.001 else f"{p:.3f}"
+
+
+def worker_variance(trials: "list[dict]") -> "dict[int, dict]":
+    """Speed of each worker relative to the others: every timing is divided by
+    the median of its (target, event, branch) over all the workers. A worker with
+    a relative median above 1 is slower, a high coefficient of variation shows
+    that its runs are disturbed."""
+    medians = {}
+    for trial in trials:
+        for event, value in trial["timings"].items():
+            medians.setdefault((trial["target"], event, trial["branch"]), []).append(value)
+    medians = {key: stats.median(values) for key, values in medians.items()}
+    relative = {}
+    for trial in trials:
+        for event, value in trial["timings"].items():
+            median = medians[(trial["target"], event, trial["branch"])]
+            if median:
+                relative.setdefault(trial.get("worker"), []).append(value / median)
+    return {
+        worker: {"n": len(values), "median": stats.median(values), "cv": stats.robust_cv(values)}
+        for worker, values in sorted(relative.items(), key=lambda item: str(item[0]))
+    }
+
+
+def print_worker_report(trials: "list[dict]", cpus: "list[set[int]]" = None):
+    rows = []
+    for worker, variance in worker_variance(trials).items():
+        rows.append([
+            worker,
+            ",".join(map(str, sorted(cpus[worker]))) if cpus else "",
+            variance["n"],
+            f"{variance['median']:.3f}",
+            f"{variance['cv'] * 100:.1f}%" + (" noisy" if variance["cv"] > stats.NOISE_THRESHOLD else ""),
+        ])
+    print("\nWorkers (timings relative to the median of all workers):")
+    print_table(["worker", "cpus", "samples", "relative median", "cv"], rows)
@@ -0,0 +1,246 @@
+import os
+import re
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import itertools
+import subprocess
+import configparser
+from urllib.parse import urlsplit, urlunsplit
+
+from helpers import checkout, build_and_copy
+from shared import get_version_info
+from . import stats
+from .report import group_samples
+
+# environment variables used to pass the settings to the Odoo test and to get its results back
+SETTINGS_ENV = "SP_BENCHMARK_SETTINGS"
+RESULTS_ENV = "SP_BENCHMARK_RESULTS"
+# url parameter selecting the assets bundle of a build, read by the spreadsheet_benchmark addon
+BUNDLE_PARAM = "sp_bench_bundle"
+
+DEFAULT_SETTINGS = {
+    "branches": ["master"],  # o-spreadsheet branches or commits
+    "documents": [130],  # ids of spreadsheet documents
+    "urls": [],  # other pages to load
+    "runs": 30,  # measured runs of each branch on each target
+    "warmup": 2,  # runs of each branch on each target discarded before measuring
+    "seed": None,  # seed of the random order of the runs
+    "version": "master",  # odoo version the builds are made for
+    # sequential mode: runs continue until the confidence interval of the ratio of every
+    # event to the baseline is narrower than +/- precision, or the time budget is spent.
+    # `runs` is then the maximum number of runs.
+    "adaptive": False,
+    "min_runs": 5,
+    "precision": 0.02,
+    "time_budget": None,  # seconds
+    # parallel mode, see `sp_tool benchmark odoo --workers`: each odoo-bin worker runs its
+    # own `schedule` with the `builds` and `commits` prepared beforehand
+    "workers": 1,
+    "worker": None,  # index of the worker
+    "schedule": None,
+    "builds": None,
+    "commits": None,
+}
+
+
+def load_settings(settings=None) -> dict:
+    """Benchmark settings, from `settings` or from the SETTINGS_ENV environment
+    variable (JSON), completed with DEFAULT_SETTINGS."""
+    if settings is None:
+        settings = json.loads(os.environ.get(SETTINGS_ENV) or "{}")
+    return {**DEFAULT_SETTINGS, **settings}
+
+
+def get_targets(settings: dict) -> "list[str]":
+    """Urls of the pages to load"""
+    targets = [
+        f"/odoo/documents/spreadsheet/{document_id}"
+        for document_id in settings["documents"]
+    ]
+    return targets + list(settings["urls"])
+
+
+def build_branches(config: configparser.ConfigParser, branches: "list[str]", version="master") -> "dict[str, str]":
+    """Build each branch (or commit) once, in a temporary folder.
+    Returns the path of the o_spreadsheet.js built for each branch."""
+    spreadsheet_path = config["spreadsheet"]["repo_path"]
+    lib_file_name = get_version_info(version)[3]
+    builds = {}
+    for branch in branches:
+        checkout(spreadsheet_path, branch)
+        safe_name = re.sub(r"[^\w.-]", "_", branch)
+        build_dir = tempfile.mkdtemp(prefix=f"benchmark_{safe_name}_")
+        build_and_copy(config, lib_file_name, build_dir, stylesheet="NO")
+        builds[branch] = os.path.join(build_dir, "o_spreadsheet.js")
+    return builds
+
+
+def resolve_commits(config: configparser.ConfigParser, branches: "list[str]") -> "dict[str, str]":
+    """Commit hash of each branch in the o-spreadsheet repository"""
+    spreadsheet_path = config["spreadsheet"]["repo_path"]
+    return {
+        branch: subprocess.check_output(
+            ["git", "rev-parse", f"{branch}^{{commit}}"], cwd=spreadsheet_path
+        ).decode("utf-8").strip()
+        for branch in branches
+    }
+
+
+def iter_schedule(branches: "list[str]", targets: "list[str]", warmup: int = 0, seed=None):
+    """Randomized block-interleaved trials: each block runs every (branch, target)
+    pair once, in a random order. The trials of the first `warmup` blocks are
+    flagged to be discarded. The blocks never end, see `make_schedule`."""
+    rnd = random.Random(seed)
+    for block in itertools.count():
+        pairs = [(branch, target) for target in targets for branch in branches]
+        rnd.shuffle(pairs)
+        for branch, target in pairs:
+            yield {"block": block, "branch": branch, "target": target, "warmup": block < warmup}
+
+
+def make_schedule(branches: "list[str]", targets: "list[str]", runs: int, warmup: int = 0, seed=None) -> "list[dict]":
+    """The trials of `warmup` + `runs` blocks of `iter_schedule`"""
+    schedule = iter_schedule(branches, targets, warmup, seed)
+    return list(itertools.islice(schedule, (warmup + runs) * len(branches) * len(targets)))
+
+
+def sequential_stop(branches: "list[str]", min_runs: int, max_runs: int, precision: float, time_budget=None):
+    """Stopping rule of the sequential mode, for `run_trials`. Stops after
+    `max_runs` blocks, when `time_budget` seconds are spent, or after at least
+    `min_runs` blocks when the bootstrap confidence interval of the ratio of
+    every event of every branch to the baseline (the first branch) is within
+    +/- `precision`. Only the events recorded by both branches are compared."""
+    start = time.monotonic()
+
+    def stop(trials):
+        runs = len({trial["block"] for trial in trials})
+        if runs >= max_runs:
+            return f"{runs} runs"
+        if time_budget is not None and time.monotonic() - start >= time_budget:
+            return f"time budget of {time_budget}s spent after {runs} runs"
+        if runs < min_runs:
+            return None
+        for by_branch in group_samples(branches, trials).values():
+            baseline = by_branch[branches[0]]
+            for branch in branches[1:]:
+                if not baseline or not by_branch[branch]:
+                    # event not recorded by one of the branches, e.g. renamed: nothing to compare
+                    continue
+                if len(baseline) < 2 or len(by_branch[branch]) < 2:
+                    return None
+                low, high = stats.bootstrap_ratio_ci(baseline, by_branch[branch], resamples=500)
+                if not (high - low) / 2 <= precision:
+                    return None
+        return f"precision of {precision:.1%} reached after {runs} runs"
+
+    return stop
+
+
+def plan_trials(settings: dict, targets: "list[str]"):
+    """Schedule and stopping rule of the trials for `run_trials`"""
+    branches = settings["branches"]
+    if settings["schedule"] is not None:
+        return settings["schedule"], None
+    if not settings["adaptive"]:
+        schedule = make_schedule(branches, targets, settings["runs"], settings["warmup"], settings["seed"])
+        return schedule, None
+    schedule = iter_schedule(branches, targets, settings["warmup"], settings["seed"])
+    stop = sequential_stop(
+        branches, settings["min_runs"], settings["runs"], settings["precision"], settings["time_budget"]
+    )
+    return schedule, stop
+
+
+def run_trials(schedule, builds: "dict[str, str]", run_trial, log=print, stop=None) -> "list[dict]":
+    """Run the trials of the schedule with `run_trial(build_file, target)`, which
+    returns the timings of the events of a page load `{event: ms}`.
+    `stop(trials)` is called with the measured trials before each measured block
+    and ends the runs by returning the reason to stop.
+    Returns the measured trials (warm-up excluded) with their timings."""
+    trials = []
+    total = f"/{len(schedule)}" if isinstance(schedule, list) else ""
+    block = None
+    for index, trial in enumerate(schedule):
+        if stop and trial["block"] != block and trials:
+            reason = stop(trials)
+            if reason:
+                log(f"[Progress] Stopped: {reason}")
+                break
+        block = trial["block"]
+        log(
+            f"[Progress] {index + 1}{total} Branch: {trial['branch']}, "
+            f"Target: {trial['target']}{' (warm-up)' if trial['warmup'] else ''}"
+        )
+        timings = run_trial(builds[trial["branch"]], trial["target"])
+        if not trial["warmup"]:
+            trials.append({**trial, "timings": timings})
+    return trials
+
+
+def split_schedules(settings: dict, targets: "list[str]") -> "list[list[dict]]":
+    """One schedule by worker. The runs are shared between the workers, each of
+    them doing its own warm-up."""
+    workers = settings["workers"]
+    schedules = []
+    for worker in range(workers):
+        runs = settings["runs"] // workers + (worker < settings["runs"] % workers)
+        seed = None if settings["seed"] is None else settings["seed"] + worker
+        schedules.append(make_schedule(settings["branches"], targets, runs, settings["warmup"], seed))
+    return schedules
+
+
+def split_cpus(workers: int) -> "list[set[int]]":
+    """Disjoint sets of the CPUs available to this process, one by worker.
+    Only available where `os.sched_getaffinity` is (Linux)."""
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < workers:
+        raise ValueError(f"{workers} workers for {len(cpus)} CPUs")
+    size = len(cpus) // workers
+    return [set(cpus[worker * size:(worker + 1) * size]) for worker in range(workers)]
+
+
+def install_bundles(builds: "dict[str, str]", bundles_path: str) -> "dict[str, str]":
+    """Copy each build once in `bundles_path`, in a folder named after the hash
+    of its content. Returns the path of the bundle of each branch, relative to
+    `bundles_path`."""
+    bundles = {}
+    for branch, build_file in builds.items():
+        with open(build_file, "rb") as f:
+            key = hashlib.sha1(f.read()).hexdigest()[:12]
+        bundle = os.path.join(bundles_path, key, "o_spreadsheet.js")
+        if not os.path.isfile(bundle):
+            os.makedirs(os.path.dirname(bundle), exist_ok=True)
+            tmp_bundle = f"{bundle}.{os.getpid()}.tmp"
+            shutil.copy2(build_file, tmp_bundle)
+            os.replace(tmp_bundle, bundle)
+        bundles[branch] = f"{key}/o_spreadsheet.js"
+    return bundles
+
+
+def bundle_url(target: str, bundle: str) -> str:
+    """Url of `target` loading the o-spreadsheet library from `bundle` (see
+    `install_bundles`) instead of the library of the Odoo sources"""
+    key = os.path.dirname(bundle)
+    url = urlsplit(target)
+    query = "&".join(filter(None, [url.query, f"{BUNDLE_PARAM}={key}"]))
+    return urlunsplit(url._replace(query=query))
+
+
+def make_results(settings: dict, trials: "list[dict]", commits=None, dataset=None) -> dict:
+    """Raw results of a benchmark. `commits` maps the branches to their commit
+    hashes, `dataset` describes what was loaded."""
+    return {"settings": settings, "commits": commits or {}, "dataset": dataset or {}, "trials": trials}
+
+
+def save_results(path: str, results: dict):
+    with open(path, "w") as f:
+        json.dump(results, f)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,184 @@
+# Statistics of the benchmark samples, with the standard library only.
+# Timings are compared with robust estimators (median, trimmed mean), a
+# bootstrap confidence interval on the ratio of the medians and two tests:
+# Mann-Whitney U (no assumption on the distributions) and Welch's t-test.
+import math
+import random
+import statistics
+from statistics import NormalDist
+
+# a sample is noisy when its robust coefficient of variation exceeds it
+NOISE_THRESHOLD = 0.1
+# scale of the median absolute deviation to estimate a standard deviation
+MAD_SCALE = 1.4826
+
+
+def median(values: "list[float]") -> float:
+    return statistics.median(values)
+
+
+def trimmed_mean(values: "list[float]", proportion: float = 0.1) -> float:
+    """Mean of the values without the `proportion` lowest and highest ones"""
+    values = sorted(values)
+    cut = int(len(values) * proportion)
+    return statistics.mean(values[cut:len(values) - cut] or values)
+
+
+def mad(values: "list[float]") -> float:
+    """Median absolute deviation"""
+    center = median(values)
+    return median([abs(value - center) for value in values])
+
+
+def robust_cv(values: "list[float]") -> float:
+    """Coefficient of variation estimated from the median and the MAD, so that
+    a few outliers do not hide the spread of the other runs"""
+    center = median(values)
+    return MAD_SCALE * mad(values) / center if center else 0.0
+
+
+def count_outliers(values: "list[float]", limit: float = 3) -> int:
+    """Values further than `limit` robust standard deviations from the median"""
+    center = median(values)
+    spread = MAD_SCALE * mad(values)
+    if not spread:
+        return 0
+    return sum(abs(value - center) > limit * spread for value in values)
+
+
+def summarize(values: "list[float]", noise_threshold: float = NOISE_THRESHOLD) -> dict:
+    return {
+        "n": len(values),
+        "median": median(values),
+        "trimmed_mean": trimmed_mean(values),
+        "mean": statistics.mean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "cv": robust_cv(values),
+        "outliers": count_outliers(values),
+        "noisy": robust_cv(values) > noise_threshold,
+    }
+
+
+def bootstrap_ratio_ci(baseline, candidate, confidence=0.95, resamples=2000, seed=0) -> "tuple[float, float]":
+    """Percentile bootstrap confidence interval of median(candidate) / median(baseline)"""
+    rnd = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        base = median(rnd.choices(baseline, k=len(baseline)))
+        cand = median(rnd.choices(candidate, k=len(candidate)))
+        if base:
+            ratios.append(cand / base)
+    if not ratios:
+        return (math.nan, math.nan)
+    ratios.sort()
+    alpha = (1 - confidence) / 2
+    low = ratios[int(alpha * (len(ratios) - 1))]
+    high = ratios[math.ceil((1 - alpha) * (len(ratios) - 1))]
+    return (low, high)
+
+
+def mann_whitney_p(a: "list[float]", b: "list[float]") -> float:
+    """Two-sided p-value of the Mann-Whitney U test, normal approximation
+    with tie and continuity corrections"""
+    n1, n2 = len(a), len(b)
+    n = n1 + n2
+    values = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    rank_sum = 0.0
+    ties = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[j + 1][0] == values[i][0]:
+            j += 1
+        count = j - i + 1
+        rank = (i + j) / 2 + 1
+        rank_sum += rank * sum(1 for k in range(i, j + 1) if values[k][1] == 0)
+        ties += count ** 3 - count
+        i = j + 1
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mu = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - mu) - 0.5) / math.sqrt(variance)
+    return min(1.0, 2 * (1 - NormalDist().cdf(max(z, 0))))
+
+
+def welch_p(a: "list[float]", b: "list[float]") -> float:
+    """Two-sided p-value of Welch's t-test"""
+    var_a = statistics.variance(a) / len(a)
+    var_b = statistics.variance(b) / len(b)
+    if not var_a + var_b:
+        return 1.0 if statistics.mean(a) == statistics.mean(b) else 0.0
+    t = (statistics.mean(a) - statistics.mean(b)) / math.sqrt(var_a + var_b)
+    df = (var_a + var_b) ** 2 / (var_a ** 2 / (len(a) - 1) + var_b ** 2 / (len(b) - 1))
+    return _incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+def required_runs(baseline, candidate, effect=0.05, alpha=0.05, power=0.8) -> int:
+    """Runs of each branch needed to detect a relative difference `effect` of
+    the baseline median, given the observed spread of both branches"""
+    sd = math.sqrt((statistics.variance(baseline) + statistics.variance(candidate)) / 2)
+    delta = effect * median(baseline)
+    if not delta:
+        return 2
+    z = NormalDist().inv_cdf(1 - alpha / 2) + NormalDist().inv_cdf(power)
+    return max(2, math.ceil(2 * (z * sd / delta) ** 2))
+
+
+def compare(baseline, candidate, alpha=0.05, effect=0.05, confidence=0.95) -> dict:
+    """Compare the samples of a candidate branch to the ones of the baseline"""
+    base = median(baseline)
+    comparison = {
+        "ratio": median(candidate) / base if base else math.nan,
+        "ci": (math.nan, math.nan),
+        "p_mann_whitney": math.nan,
+        "p_welch": math.nan,
+        "required_runs": None,
+        "significant": False,
+    }
+    if len(baseline) < 2 or len(candidate) < 2:
+        return comparison
+    comparison["ci"] = bootstrap_ratio_ci(baseline, candidate, confidence)
+    comparison["p_mann_whitney"] = mann_whitney_p(baseline, candidate)
+    comparison["p_welch"] = welch_p(baseline, candidate)
+    comparison["required_runs"] = required_runs(baseline, candidate, effect, alpha)
+    low, high = comparison["ci"]
+    comparison["significant"] = comparison["p_mann_whitney"] < alpha and not low <= 1 <= high
+    return comparison
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return front * _beta_continued_fraction(a, b, x) / a
+    return 1 - front * _beta_continued_fraction(b, a, 1 - x) / b
+
+
+def _beta_continued_fraction(a, b, x, iterations=200, epsilon=1e-12):
+    # Lentz's algorithm
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, iterations + 1):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1) < epsilon:
+            break
+    return result
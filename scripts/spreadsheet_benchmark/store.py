@@ -0,0 +1,161 @@
+# Local SQLite store of the benchmark results.
+# A run holds the machine fingerprint, the dataset descriptor, the commit of
+# each compared branch and every raw sample, so that runs made on the same
+# machine can be compared across commits.
+import os
+import json
+import time
+import hashlib
+import platform
+import sqlite3
+import statistics
+
+from const import BENCHMARK_STORE_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    machine_info TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    settings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_branches (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    branch TEXT NOT NULL,
+    commit_hash TEXT,
+    PRIMARY KEY (run_id, branch)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    branch TEXT NOT NULL,
+    target TEXT NOT NULL,
+    event TEXT NOT NULL,
+    block INTEGER,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_event ON samples (target, event);
+"""
+
+
+def connect(path: str = BENCHMARK_STORE_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def machine_info() -> dict:
+    """What makes timings of different machines not comparable"""
+    cpu = platform.processor()
+    if os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    memory = None
+    if hasattr(os, "sysconf") and "SC_PHYS_PAGES" in os.sysconf_names:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return {
+        "node": platform.node(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "machine": platform.machine(),
+        "cpu": cpu,
+        "cpu_count": os.cpu_count(),
+        "memory": memory,
+    }
+
+
+def machine_fingerprint(info: dict = None) -> str:
+    info = info or machine_info()
+    return hashlib.sha1(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def save_run(results: dict, source: str, path: str = BENCHMARK_STORE_PATH) -> int:
+    """Store the results written by `save_results`. Returns the id of the run."""
+    info = machine_info()
+    with connect(path) as connection:
+        run_id = connection.execute(
+            "INSERT INTO runs (created_at, source, machine, machine_info, dataset, settings) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                time.time(),
+                source,
+                machine_fingerprint(info),
+                json.dumps(info),
+                json.dumps(results.get("dataset") or {}),
+                json.dumps(results["settings"]),
+            ),
+        ).lastrowid
+        commits = results.get("commits") or {}
+        connection.executemany(
+            "INSERT INTO run_branches (run_id, branch, commit_hash) VALUES (?, ?, ?)",
+            [(run_id, branch, commits.get(branch)) for branch in results["settings"]["branches"]],
+        )
+        connection.executemany(
+            "INSERT INTO samples (run_id, branch, target, event, block, value) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, trial["branch"], trial["target"], event, trial.get("block"), value)
+                for trial in results["trials"]
+                for event, value in trial["timings"].items()
+            ],
+        )
+    connection.close()
+    return run_id
+
+
+def get_history(machine: str = None, target: str = None, event: str = None, branch: str = None,
+                path: str = BENCHMARK_STORE_PATH) -> "dict[tuple[str, str], list[dict]]":
+    """Median of each branch of each run, by (target, event), oldest first.
+    Only the runs of `machine` (a fingerprint) are returned if given."""
+    query = """
+        SELECT r.id, r.created_at, s.branch, b.commit_hash, s.target, s.event, s.value
+          FROM samples s
+          JOIN runs r ON r.id = s.run_id
+          LEFT JOIN run_branches b ON b.run_id = s.run_id AND b.branch = s.branch
+         WHERE (:machine IS NULL OR r.machine = :machine)
+           AND (:target IS NULL OR s.target = :target)
+           AND (:event IS NULL OR s.event = :event)
+           AND (:branch IS NULL OR s.branch = :branch)
+         ORDER BY r.created_at, r.id
+    """
+    params = {"machine": machine, "target": target, "event": event, "branch": branch}
+    points = {}
+    with connect(path) as connection:
+        for run_id, created_at, branch_name, commit, target_url, event_name, value in connection.execute(query, params):
+            series = points.setdefault((target_url, event_name), {})
+            point = series.setdefault((run_id, branch_name), {
+                "run_id": run_id,
+                "created_at": created_at,
+                "branch": branch_name,
+                "commit": commit,
+                "values": [],
+            })
+            point["values"].append(value)
+    connection.close()
+    history = {}
+    for key, series in points.items():
+        history[key] = []
+        for point in series.values():
+            values = point.pop("values")
+            history[key].append({**point, "n": len(values), "median": statistics.median(values)})
+    return history
+
+
+def flag_regressions(series: "list[dict]", threshold: float = 0.05, window: int = 5) -> "list[dict]":
+    """Compare each point to the rolling baseline, the median of the medians
+    of the `window` previous points. A point slower than the baseline by more
+    than `threshold` (relative) is a regression."""
+    flagged = []
+    for index, point in enumerate(series):
+        previous = [p["median"] for p in series[max(0, index - window):index]]
+        baseline = statistics.median(previous) if previous else None
+        change = point["median"] / baseline - 1 if baseline else None
+        flagged.append({
+            **point,
+            "baseline": baseline,
+            "change": change,
+            "regression": change is not None and change > threshold,
+        })
+    return flagged
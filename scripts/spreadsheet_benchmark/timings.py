@@ -0,0 +1,107 @@
+# Timing records of a page load, built from the console messages of the page.
+# A record is {"name", "path", "depth", "index", "start", "duration"}:
+# - `path` lists the names of the enclosing groups, opened by messages like
+#   "##### Model creation #####" and closed by a message made of "#" only,
+# - `index` is the repetition of the same name in the same path (0, 1, ...),
+# - `start` and `duration` are in ms, `start` relative to the first message.
+# Messages "[sp-bench] <json record>" are records emitted as is by the page,
+# other messages are timings when they end with "<number> ms".
+import re
+import json
+
+RECORD_PREFIX = "[sp-bench]"
+GROUP_RE = re.compile(r"^(#{3,})\s*(.*?)\s*#*$")
+NUMBER_RE = re.compile(r"^-?\d+(?:\.\d+)?(?:e-?\d+)?$")
+PATH_SEPARATOR = " > "
+
+
+def cdp_value(arg: dict):
+    """Python value of a Runtime.RemoteObject console argument"""
+    if "value" in arg:
+        return arg["value"]
+    return arg.get("description", "")
+
+
+def parse_records(messages: "list[tuple[list, float]]") -> "list[dict]":
+    """Timing records of console messages given as (arguments, timestamp),
+    arguments being Python values (see `cdp_value`) and timestamps in ms, or None."""
+    records = []
+    path = []
+    counts = {}
+    origin = next((timestamp for _args, timestamp in messages if timestamp is not None), None)
+    for args, timestamp in messages:
+        if args and args[0] == RECORD_PREFIX:
+            record = json.loads(args[1])
+            record_path = record.get("path", path)
+            name = record["name"]
+            start = record.get("start")
+        else:
+            group = _parse_group(args)
+            if group is not None:
+                if group:
+                    path.append(group)
+                elif path:
+                    path.pop()
+                continue
+            timing = _parse_timing(args)
+            if timing is None:
+                continue
+            name, duration = timing
+            record = {"duration": duration}
+            record_path = list(path)
+            start = None
+            if timestamp is not None and origin is not None:
+                start = timestamp - origin - duration
+        key = (tuple(record_path), name)
+        index = counts.get(key, 0)
+        counts[key] = index + 1
+        records.append({
+            "name": name,
+            "path": list(record_path),
+            "depth": len(record_path),
+            "index": index,
+            "start": start,
+            "duration": record["duration"],
+        })
+    return records
+
+
+def aggregate(records: "list[dict]") -> "dict[str, float]":
+    """Total duration of the records by event, an event being the path and the
+    name of the records: repetitions are summed, nested records are kept apart
+    from the records of the same name elsewhere."""
+    timings = {}
+    for record in records:
+        event = PATH_SEPARATOR.join(record["path"] + [record["name"]])
+        timings[event] = timings.get(event, 0) + record["duration"]
+    return timings
+
+
+def _tokens(args: list) -> list:
+    tokens = []
+    for arg in args:
+        if isinstance(arg, (int, float)) and not isinstance(arg, bool):
+            tokens.append(float(arg))
+            continue
+        for word in str(arg).split():
+            tokens.append(float(word) if NUMBER_RE.match(word) else word)
+    return tokens
+
+
+def _parse_group(args: list):
+    """Name of the group opened by the message, "" if it closes one, None otherwise"""
+    if len(args) != 1 or not isinstance(args[0], str):
+        return None
+    match = GROUP_RE.match(args[0].strip())
+    return match.group(2) if match else None
+
+
+def _parse_timing(args: list):
+    """(name, duration) of a message ending with "<number> ms". The name is
+    made of the words before the duration, without the other numbers, so that
+    "Replayed 12 commands in 3 ms" is always "Replayed commands in"."""
+    tokens = _tokens(args)
+    if len(tokens) < 2 or tokens[-1] != "ms" or not isinstance(tokens[-2], float):
+        return None
+    name = " ".join(token for token in tokens[:-2] if isinstance(token, str))
+    return name or "Global", tokens[-2]
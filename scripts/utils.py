@@ -1,12 +1,14 @@
 import contextlib
 import os
 import re
+import json
 import subprocess
+import threading
 import time
 from functools import partial
 
 from typing import List
-from const import USER_HOME
+from const import USER_HOME, BUNDLE_INFO_CACHE_PATH
 
 # See https://stackoverflow.com/questions/6194499/pushd-through-os-system
 # Allows one to execute code in a given dir
@@ -112,25 +114,73 @@ def find_file() -> str:
     return ""
 
 
-def get_o_spreadsheet_js_hash(o_spredsheet_path) -> str:
-    """Extract the commit hash from the o_spreadsheet.js file footer
-    which looks like this:
+BUNDLE_INFO_RE = re.compile(r"""__info__\.(version|date|hash)\s*=\s*["']([^"']*)["']""")
+# the footer holding the info is within the last lines of the bundle
+BUNDLE_INFO_TAIL = 4096  # bytes
+_bundle_info_cache = {}
+_blob_info_cache = None
+_blob_info_lock = threading.Lock()
+
+
+def parse_bundle_info(text: str) -> "dict[str, str]":
+    """version, date and hash found in the footer of an o_spreadsheet.js bundle
     ```
     __info__.version = "16.5.0-alpha.10";
     __info__.date = "2023-10-19T10:55:27.590Z";
     __info__.hash = "031593c2";
     ```
     """
-    # TORORAR make it crossplatform
-    lines = (
-        subprocess.check_output(["tail", "-10", o_spredsheet_path])
-        .decode("utf-8")
-        .split("\n")
-    )
-    hash_line = [line for line in lines if "hash" in line][0]
-    # it can be a single or double quotes string
-    commit_hash = re.findall(r"[\",'](.+?)[\",']", hash_line)[0]
-    return commit_hash
+    return dict(BUNDLE_INFO_RE.findall(text))
+
+
+def read_bundle_info(o_spreadsheet_path) -> "dict[str, str]":
+    """Info of the bundle at the given path, read from its last bytes only.
+    Results are cached by path, modification time and size."""
+    stat = os.stat(o_spreadsheet_path)
+    key = (os.path.abspath(o_spreadsheet_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _bundle_info_cache:
+        with open(o_spreadsheet_path, "rb") as f:
+            f.seek(max(stat.st_size - BUNDLE_INFO_TAIL, 0))
+            tail = f.read().decode("utf-8", errors="replace")
+        _bundle_info_cache[key] = parse_bundle_info(tail)
+    return _bundle_info_cache[key]
+
+
+def get_o_spreadsheet_js_hash(o_spredsheet_path) -> str:
+    """Extract the commit hash from the o_spreadsheet.js file footer, see `parse_bundle_info`"""
+    return read_bundle_info(o_spredsheet_path).get("hash")
+
+
+def read_git_bundle_info(repo, revision: str, path: str) -> "dict[str, str] | None":
+    """Info of the bundle at `path` in `revision` of `repo` (see `repo.Repo`),
+    None if there is no such file. Git objects are stored compressed, so a blob
+    cannot be read from its end: the whole blob is read, once. Results are
+    cached on disk by blob id, an unchanged bundle is never read again."""
+    global _blob_info_cache
+    blob = repo.rev_parse(f"{revision}:{path}")
+    if blob is None:
+        return None
+    with _blob_info_lock:
+        if _blob_info_cache is None:
+            try:
+                with open(BUNDLE_INFO_CACHE_PATH) as f:
+                    _blob_info_cache = json.load(f)
+            except (OSError, ValueError):
+                _blob_info_cache = {}
+        if blob in _blob_info_cache:
+            return _blob_info_cache[blob]
+    content = repo.show_file(blob)
+    if content is None:
+        return None
+    info = parse_bundle_info(content[-BUNDLE_INFO_TAIL:].decode("utf-8", errors="replace"))
+    with _blob_info_lock:
+        _blob_info_cache[blob] = info
+        os.makedirs(os.path.dirname(BUNDLE_INFO_CACHE_PATH), exist_ok=True)
+        tmp_path = f"{BUNDLE_INFO_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_blob_info_cache, f)
+        os.replace(tmp_path, BUNDLE_INFO_CACHE_PATH)
+    return info
 
 
 def retry_cmd(cmd_args: List[str], nbr_retry: int):
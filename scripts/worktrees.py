@@ -0,0 +1,57 @@
+# Git worktrees used to work on several versions at the same time.
+# Worktrees are kept between runs (in WORKTREES_PATH) so that the large Odoo
+# trees and o-spreadsheet node_modules do not have to be recreated every time.
+import os
+import hashlib
+import configparser
+import subprocess
+
+from const import WORKTREES_PATH
+from utils import pushd
+from shared import get_verbose
+
+# written in node_modules once installed from a given package-lock.json
+NODE_MODULES_LOCK_FILE = ".sp_tool_lock"
+
+
+def get_worktree(config: configparser.ConfigParser, repo: str, version: str) -> str:
+    """Return the path of a worktree of `repo` dedicated to `version`, checked out
+    (detached) on the remote branch of this version.
+    Worktrees must be prepared one at a time since they share the same git directory.
+    """
+    repo_path = config[repo]["repo_path"]
+    ref = f"{config[repo]['remote']}/{version}"
+    path = os.path.join(WORKTREES_PATH, repo, version)
+    with pushd(repo_path):
+        if not os.path.isdir(path):
+            get_verbose() and print(f"Creating worktree {path} ...")
+            subprocess.check_output(["git", "worktree", "prune"])
+            subprocess.check_output(["git", "worktree", "add", "--detach", path, ref])
+    with pushd(path):
+        subprocess.check_output(["git", "checkout", "--force", "--detach", ref])
+    return path
+
+
+def worktree_config(config: configparser.ConfigParser, repos: "list[str]", version: str) -> configparser.ConfigParser:
+    """Copy of the config where the repositories `repos` point to their worktree for `version`"""
+    wt_config = configparser.ConfigParser()
+    wt_config.read_dict(config)
+    for repo in repos:
+        wt_config[repo]["repo_path"] = get_worktree(config, repo, version)
+    return wt_config
+
+
+def install_node_modules(path: str):
+    """Run `npm ci` unless node_modules was already installed from the current package-lock.json"""
+    with pushd(path):
+        with open("package-lock.json", "rb") as f:
+            lock_hash = hashlib.sha1(f.read()).hexdigest()
+        lock_file = os.path.join("node_modules", NODE_MODULES_LOCK_FILE)
+        if os.path.isfile(lock_file):
+            with open(lock_file) as f:
+                if f.read() == lock_hash:
+                    return
+        print(f"Installing node modules in {path} ...")
+        subprocess.check_output(["npm", "ci"])
+        with open(lock_file, "w") as f:
+            f.write(lock_hash)